@@ -0,0 +1,142 @@
+"""
+Inference Backend Benchmark
+===========================
+
+Compares per-frame latency and peak memory (RSS) of the inference
+backends in ml_detector.py on synthetic frames.
+
+Each backend runs in its own subprocess so model load time and RSS are
+measured in isolation.
+
+Usage:
+    python benchmark_inference.py                          # all backends
+    python benchmark_inference.py --backends pytorch onnx --frames 50
+    python benchmark_inference.py --json results.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    except Exception:
+        return float("nan")
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float("nan")
+
+
+def run_backend(name: str, frames: int, width: int, height: int) -> dict:
+    """Benchmark one backend in the current process"""
+    import ml_detector
+
+    backend = ml_detector.get_backend(name)
+    backend.export()  # Exporting is a one-off cost, keep it out of the load time
+
+    started = time.perf_counter()
+    model = backend.load()
+    load_seconds = time.perf_counter() - started
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+
+    # Warm-up (first call builds sessions / allocates buffers)
+    started = time.perf_counter()
+    model(frame, conf=ml_detector.CONFIDENCE_THRESHOLD, verbose=False)
+    first_ms = (time.perf_counter() - started) * 1000
+
+    latencies = []
+    for _ in range(frames):
+        started = time.perf_counter()
+        model(frame, conf=ml_detector.CONFIDENCE_THRESHOLD, verbose=False)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "backend": name,
+        "artifact": backend.artifact_path(),
+        "frame": f"{width}x{height}",
+        "frames": frames,
+        "load_s": round(load_seconds, 3),
+        "first_frame_ms": round(first_ms, 2),
+        "mean_ms": round(float(np.mean(latencies)), 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "fps": round(1000 / float(np.mean(latencies)), 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inference backends")
+    parser.add_argument("--backends", nargs="+", default=["pytorch", "onnx", "onnx-int8", "openvino"])
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--size", default="1280x720", help="Synthetic frame size WxH")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.lower().split("x"))
+
+    if args.worker:
+        print(json.dumps(run_backend(args.worker, args.frames, width, height)))
+        return
+
+    print("=" * 60)
+    print("INFERENCE BACKEND BENCHMARK")
+    print("=" * 60)
+
+    results = []
+    for name in args.backends:
+        print(f"\n⏱️ {name}...")
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", name,
+             "--frames", str(args.frames), "--size", args.size],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+        if proc.returncode != 0 or not lines:
+            error = (proc.stderr.strip().splitlines() or ["unknown error"])[-1]
+            print(f"   ❌ Skipped: {error}")
+            results.append({"backend": name, "error": error})
+            continue
+        result = json.loads(lines[-1])
+        results.append(result)
+        print(f"   ✅ p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, "
+              f"{result['fps']} fps, load {result['load_s']} s, RSS {result['peak_rss_mb']} MB")
+
+    print("\n" + "=" * 60)
+    print(f"{'backend':<12}{'p50 ms':>10}{'p95 ms':>10}{'fps':>8}{'load s':>9}{'RSS MB':>10}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['backend']:<12}{'n/a':>10}")
+        else:
+            print(f"{r['backend']:<12}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['fps']:>8}"
+                  f"{r['load_s']:>9}{r['peak_rss_mb']:>10}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n📄 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Detection and Storage Benchmark Suite
+=====================================
+
+Offline, in-process benchmarks of the API hot paths:
+- detect_pothole()    - called directly, synthetic frames per resolution
+- POST /detect        - same frames through the FastAPI app (TestClient)
+- POST /potholes      - single inserts
+- GET /potholes       - full list, bbox query and one keyset page
+- DELETE /potholes/id - deletes of random existing rows
+
+Every dataset size runs in its own subprocess with a fresh temporary
+DATA_DIR seeded with synthetic potholes, so runs are reproducible (fixed
+RNG seeds) and peak RSS is per dataset. Results include p50/p95/p99
+latency, throughput and peak RSS so far, and can be written as JSON and
+compared against an earlier run.
+
+Usage:
+    python benchmark_suite.py                                # 1k, 10k, 100k rows
+    python benchmark_suite.py --rows 1000 1000000 --storage csv
+    python benchmark_suite.py --json after.json --compare before.json
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from benchmark_inference import peak_rss_mb, percentile
+
+# Rows above this skip the unpaged GET /potholes (it serializes every row)
+FULL_LIST_MAX_ROWS = 100000
+# Synthetic potholes are scattered over a ~50 x 50 km city
+CITY_CENTER = (37.7749, -122.4194)
+CITY_SPAN_DEG = 0.45
+
+
+def summarize(name: str, latencies_s, extra: dict) -> dict:
+    """Latency percentiles (ms) and throughput for one scenario"""
+    ms = [value * 1000 for value in latencies_s]
+    total = sum(latencies_s)
+    return {
+        "scenario": name,
+        **extra,
+        "requests": len(ms),
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "throughput_rps": round(len(ms) / total, 2) if total else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def timed_calls(fn, count: int):
+    latencies = []
+    for i in range(count):
+        started = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def synthetic_frame(rng, width: int, height: int) -> bytes:
+    """JPEG of a grey road texture with a dark elliptical patch"""
+    import cv2
+    frame = rng.integers(90, 150, size=(height, width, 3), dtype=np.uint8)
+    center = (int(rng.integers(width // 4, 3 * width // 4)), int(rng.integers(height // 2, height - height // 8)))
+    axes = (max(4, width // 10), max(3, height // 16))
+    cv2.ellipse(frame, center, axes, 0, 0, 360, (35, 35, 40), -1)
+    ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    return encoded.tobytes()
+
+
+def write_dataset(csv_file: str, rows: int, seed: int = 0):
+    """Synthetic potholes in the legacy CSV layout (imported by either store)"""
+    from storage import RECORD_FIELDS
+    rng = np.random.default_rng(seed)
+    lats = CITY_CENTER[0] + (rng.random(rows) - 0.5) * CITY_SPAN_DEG
+    lons = CITY_CENTER[1] + (rng.random(rows) - 0.5) * CITY_SPAN_DEG
+    confidences = 0.3 + rng.random(rows) * 0.7
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    with open(csv_file, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(RECORD_FIELDS)
+        for i in range(rows):
+            timestamp = (start + timedelta(seconds=i * 60)).strftime("%Y-%m-%dT%H:%M:%SZ")
+            writer.writerow([i + 1, round(lats[i], 6), round(lons[i], 6), timestamp,
+                             round(confidences[i], 4), "", 1, timestamp])
+
+
+def run_worker(args) -> list:
+    """Benchmark one dataset size in this process (fresh DATA_DIR, removed afterwards)"""
+    data_dir = tempfile.mkdtemp(prefix="pothole-bench-")
+    try:
+        return run_scenarios(args, data_dir)
+    finally:
+        # Large --rows runs leave hundreds of MB of store files behind otherwise
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def run_scenarios(args, data_dir: str) -> list:
+    os.environ.update({
+        "DATA_DIR": data_dir,
+        "STORAGE_BACKEND": args.storage,
+        "WARMUP_MODEL": "0",
+        "DEDUP_RADIUS_M": "0",          # Every POST inserts
+        "STATS_FLUSH_SECONDS": "3600",
+        "FRAME_CACHE_ENTRIES": "0",     # Every frame pays for inference
+        "LOG_LEVEL": "WARNING",
+    })
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    write_dataset(os.path.join(data_dir, "potholes.csv"), args.worker_rows)
+
+    # Config is read from the environment at import time
+    from contextlib import redirect_stdout
+    with redirect_stdout(io.StringIO()):
+        import main
+        import ml_detector
+        from fastapi.testclient import TestClient
+
+    rows = args.worker_rows
+    results = []
+    rng = np.random.default_rng(1)
+    client_cm = TestClient(main.app)
+    with redirect_stdout(io.StringIO()):
+        client = client_cm.__enter__()  # Runs startup: store import + spatial index
+
+    try:
+        with redirect_stdout(io.StringIO()):
+            # Detection: direct call and through the API
+            for size in args.resolutions if not args.skip_detect else []:
+                width, height = (int(v) for v in size.lower().split("x"))
+                frames = [synthetic_frame(rng, width, height) for _ in range(min(args.frames, 8))]
+                ml_detector.detect_pothole(frames[0])  # Load + warm the model outside the timings
+                latencies = timed_calls(lambda i: ml_detector.detect_pothole(frames[i % len(frames)]), args.frames)
+                results.append(summarize("detect_pothole", latencies, {"rows": rows, "resolution": size}))
+                latencies = timed_calls(
+                    lambda i: client.post("/detect", files={"file": ("frame.jpg", frames[i % len(frames)], "image/jpeg")}),
+                    args.frames,
+                )
+                results.append(summarize("POST /detect", latencies, {"rows": rows, "resolution": size}))
+
+            # Reads
+            if rows <= args.full_list_max_rows:
+                latencies = timed_calls(lambda i: client.get("/potholes"), args.list_requests)
+                results.append(summarize("GET /potholes", latencies, {"rows": rows}))
+            half = CITY_SPAN_DEG / 20
+            centers = [(CITY_CENTER[0] + (rng.random() - 0.5) * CITY_SPAN_DEG,
+                        CITY_CENTER[1] + (rng.random() - 0.5) * CITY_SPAN_DEG) for _ in range(args.requests)]
+            latencies = timed_calls(
+                lambda i: client.get("/potholes", params={
+                    "bbox": f"{centers[i][1] - half},{centers[i][0] - half},{centers[i][1] + half},{centers[i][0] + half}"
+                }),
+                args.requests,
+            )
+            results.append(summarize("GET /potholes?bbox", latencies, {"rows": rows}))
+            latencies = timed_calls(
+                lambda i: client.get("/potholes", params={
+                    "sort": "confidence", "order": "desc", "limit": 100,
+                    "after_id": int(rng.integers(1, rows + 1)) if rows else None,
+                }),
+                args.requests,
+            )
+            results.append(summarize("GET /potholes?limit=100", latencies, {"rows": rows}))
+
+            # Writes
+            now = datetime.now(timezone.utc).isoformat()
+            latencies = timed_calls(
+                lambda i: client.post("/potholes", json={
+                    "latitude": centers[i][0], "longitude": centers[i][1],
+                    "timestamp": now, "confidence": 0.8,
+                }),
+                args.requests,
+            )
+            results.append(summarize("POST /potholes", latencies, {"rows": rows}))
+
+            delete_ids = rng.choice(np.arange(1, rows + 1), size=min(args.requests, rows), replace=False).tolist() if rows else []
+            latencies = timed_calls(lambda i: client.delete(f"/potholes/{delete_ids[i]}"), len(delete_ids))
+            results.append(summarize("DELETE /potholes/{id}", latencies, {"rows": rows}))
+    finally:
+        with redirect_stdout(io.StringIO()):
+            client_cm.__exit__(None, None, None)
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+
+def result_key(result: dict) -> tuple:
+    return (result["scenario"], result.get("rows"), result.get("resolution"))
+
+
+def compare(results: list, baseline_file: str, threshold: float):
+    """Print p95 changes against an earlier --json file"""
+    with open(baseline_file) as f:
+        baseline = {result_key(r): r for r in json.load(f)["results"] if "error" not in r}
+    print("\n" + "=" * 60)
+    print(f"COMPARISON WITH {baseline_file} (p95)")
+    print("=" * 60)
+    for result in results:
+        before = baseline.get(result_key(result))
+        if before is None or "error" in result or not before["p95_ms"]:
+            continue
+        change = (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+        flag = "⚠️ " if change > threshold else ("✅ " if change < -threshold else "   ")
+        label = " ".join(str(part) for part in result_key(result) if part is not None)
+        print(f"{flag}{label:<45}{before['p95_ms']:>10.2f} -> {result['p95_ms']:>10.2f} ms ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detection and storage hot paths")
+    parser.add_argument("--rows", nargs="+", type=int, default=[1000, 10000, 100000],
+                        help="Synthetic dataset sizes")
+    parser.add_argument("--resolutions", nargs="+", default=["640x480", "1280x720", "1920x1080"])
+    parser.add_argument("--frames", type=int, default=20, help="Detections per resolution")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per storage scenario")
+    parser.add_argument("--list-requests", type=int, default=5, help="Requests for the unpaged GET /potholes")
+    parser.add_argument("--full-list-max-rows", type=int, default=FULL_LIST_MAX_ROWS)
+    parser.add_argument("--storage", choices=["sqlite", "csv"], default="sqlite")
+    parser.add_argument("--skip-detect", action="store_true", help="Storage scenarios only")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--compare", help="Earlier --json output to compare p95 against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    parser.add_argument("--worker-rows", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker_rows is not None:
+        print(json.dumps(run_worker(args)))
+        return
+
+    print("=" * 60)
+    print("DETECTION & STORAGE BENCHMARK")
+    print("=" * 60)
+
+    results = []
+    for rows in args.rows:
+        print(f"\n⏱️ {rows} rows ({args.storage})...")
+        command = [sys.executable, os.path.abspath(__file__), "--worker-rows", str(rows),
+                   "--resolutions", *args.resolutions, "--frames", str(args.frames),
+                   "--requests", str(args.requests), "--list-requests", str(args.list_requests),
+                   "--full-list-max-rows", str(args.full_list_max_rows), "--storage", args.storage]
+        if args.skip_detect:
+            command.append("--skip-detect")
+        proc = subprocess.run(command, capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+        lines = [line for line in proc.stdout.splitlines() if line.startswith("[")]
+        if proc.returncode != 0 or not lines:
+            error = (proc.stderr.strip().splitlines() or ["unknown error"])[-1]
+            print(f"   ❌ Failed: {error}")
+            results.append({"scenario": "all", "rows": rows, "error": error})
+            continue
+        for result in json.loads(lines[-1]):
+            results.append(result)
+            label = result["scenario"] + (f" @ {result['resolution']}" if "resolution" in result else "")
+            print(f"   ✅ {label:<32} p50 {result['p50_ms']:>9.2f}  p95 {result['p95_ms']:>9.2f}  "
+                  f"p99 {result['p99_ms']:>9.2f} ms  {result['throughput_rps']} req/s  "
+                  f"RSS {result['peak_rss_mb']} MB")
+
+    if args.compare:
+        compare(results, args.compare, args.threshold)
+
+    if args.json:
+        output = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "storage": args.storage,
+                "rows": args.rows,
+                "resolutions": args.resolutions,
+            },
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"\n📄 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Detection Statistics
+====================
+
+Counters behind /detection-stats, updated incrementally and served from
+memory (no directory listing per request):
+- frames processed, detected / not detected, errors
+- frames answered from the near-duplicate frame cache (kept out of the
+  counts above, which describe fresh model passes)
+- mean inference latency
+- confidence histogram (0.1 wide bins)
+- detections per hour (last 48 h) and per day (last 90 days), UTC
+- potholes created vs. reports merged into an existing pothole
+
+Every value is additive, so each process keeps a delta since its last
+flush. At most every STATS_FLUSH_SECONDS (from a background thread) and
+at shutdown the delta is added to STATS_FILE under a file lock, which
+lets several uvicorn workers share one set of totals.
+"""
+
+import copy
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: single worker, no lock needed
+    fcntl = None
+
+from log import get_logger
+from storage import DATA_DIR
+
+log = get_logger("stats")
+
+STATS_FILE = os.path.join(DATA_DIR, "detection_stats.json")
+STATS_FLUSH_SECONDS = float(os.getenv("STATS_FLUSH_SECONDS", "30"))
+HOURLY_RETENTION = 48
+DAILY_RETENTION = 90
+HISTOGRAM_BINS = 10
+
+
+def empty_counters() -> dict:
+    return {
+        "frames": 0,
+        "detected": 0,
+        "not_detected": 0,
+        "errors": 0,
+        "cached_frames": 0,
+        "latency_ms_sum": 0.0,
+        "latency_ms_count": 0,
+        "confidence_histogram": [0] * HISTOGRAM_BINS,
+        "hourly": {},
+        "daily": {},
+        "potholes_created": 0,
+        "reports_merged": 0,
+    }
+
+
+def add_counters(total: dict, delta: dict) -> dict:
+    """Add delta into total in place (numbers, lists element-wise, dicts per key)"""
+    for key, value in delta.items():
+        if isinstance(value, dict):
+            bucket = total.setdefault(key, {})
+            for name, count in value.items():
+                bucket[name] = bucket.get(name, 0) + count
+        elif isinstance(value, list):
+            current = total.setdefault(key, [0] * len(value))
+            for i, count in enumerate(value):
+                current[i] += count
+        else:
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+def _prune(bucket: dict, keep: int) -> dict:
+    # Keys are ISO prefixes, so lexical order is chronological
+    return {key: bucket[key] for key in sorted(bucket)[-keep:]}
+
+
+class DetectionStats:
+    """In-memory detection counters with periodic, mergeable persistence"""
+
+    def __init__(self, path: str = STATS_FILE, flush_seconds: float = STATS_FLUSH_SECONDS):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._base: Optional[dict] = None  # Totals as of the last flush
+        self._delta = empty_counters()
+        self._last_flush = time.monotonic()
+        self._flushing = False  # A background flush is running
+
+    def _read_file(self) -> Optional[dict]:
+        try:
+            with open(self.path, "r") as f:
+                return add_counters(empty_counters(), json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.warning("⚠️ Could not read %s: %s", self.path, e)
+            return None
+
+    def load(self, seed: Optional[Callable[[], int]] = None):
+        """Load persisted totals; without a stats file, seed() gives the initial detection count"""
+        base = self._read_file()
+        if base is None:
+            base = empty_counters()
+            if seed is not None:
+                base["detected"] = base["frames"] = seed()
+        with self._lock:
+            self._base = base
+
+    def _ensure_loaded(self):
+        if self._base is None:
+            self.load()
+
+    def record_frame(self, detected: bool, confidence: Optional[float] = None,
+                     latency_ms: Optional[float] = None):
+        """Count one processed frame"""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            delta = self._delta
+            delta["frames"] += 1
+            if latency_ms is not None:
+                delta["latency_ms_sum"] += latency_ms
+                delta["latency_ms_count"] += 1
+            if detected:
+                delta["detected"] += 1
+                hour = now.strftime("%Y-%m-%dT%H")
+                day = now.strftime("%Y-%m-%d")
+                delta["hourly"][hour] = delta["hourly"].get(hour, 0) + 1
+                delta["daily"][day] = delta["daily"].get(day, 0) + 1
+                if confidence is not None:
+                    index = min(HISTOGRAM_BINS - 1, max(0, int(confidence * HISTOGRAM_BINS)))
+                    delta["confidence_histogram"][index] += 1
+            else:
+                delta["not_detected"] += 1
+        self._maybe_flush()
+
+    def record_cached_frame(self):
+        """Count one frame answered from the frame cache (no model pass)"""
+        with self._lock:
+            self._delta["cached_frames"] += 1
+        self._maybe_flush()
+
+    def record_error(self):
+        with self._lock:
+            self._delta["errors"] += 1
+        self._maybe_flush()
+
+    def record_potholes(self, created: int = 0, merged: int = 0):
+        """Count stored reports (new potholes / merged into existing ones)"""
+        with self._lock:
+            self._delta["potholes_created"] += created
+            self._delta["reports_merged"] += merged
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        """
+        Start a background flush when one is due.
+
+        Counters are recorded from the event loop (async /detect paths), so
+        the file lock and write must not run on the calling thread.
+        """
+        if time.monotonic() - self._last_flush < self.flush_seconds:
+            return
+        with self._lock:
+            if self._flushing:
+                return
+            self._flushing = True
+            self._last_flush = time.monotonic()
+        threading.Thread(target=self._background_flush, name="stats-flush", daemon=True).start()
+
+    def _background_flush(self):
+        try:
+            self.flush()
+        finally:
+            self._flushing = False
+
+    def flush(self):
+        """Add the pending delta to the stats file (merging other workers' totals)"""
+        self._ensure_loaded()
+        with self._lock:
+            delta, self._delta = self._delta, empty_counters()
+            self._last_flush = time.monotonic()
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(f"{self.path}.lock", "w") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                totals = self._read_file() or copy.deepcopy(self._base)
+                add_counters(totals, delta)
+                totals["hourly"] = _prune(totals["hourly"], HOURLY_RETENTION)
+                totals["daily"] = _prune(totals["daily"], DAILY_RETENTION)
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(totals, f)
+                os.replace(tmp_path, self.path)
+                with self._lock:
+                    self._base = totals
+        except OSError as e:
+            log.warning("⚠️ Could not save detection stats: %s", e)
+            with self._lock:
+                add_counters(self._delta, delta)  # Retry on the next flush
+
+    def snapshot(self) -> dict:
+        """Aggregates for /detection-stats"""
+        self._ensure_loaded()
+        with self._lock:
+            totals = add_counters(copy.deepcopy(self._base), self._delta)
+
+        frames = totals["frames"]
+        latency_count = totals["latency_ms_count"]
+        hourly = _prune(totals["hourly"], 24)
+        daily = _prune(totals["daily"], 30)
+        return {
+            "total_detections": totals["detected"],
+            "frames_processed": frames,
+            "no_detections": totals["not_detected"],
+            "detection_rate": round(totals["detected"] / frames, 4) if frames else 0.0,
+            "errors": totals["errors"],
+            "cached_frames": totals["cached_frames"],
+            "mean_inference_ms": round(totals["latency_ms_sum"] / latency_count, 2) if latency_count else None,
+            "confidence_histogram": [
+                {"range": f"{i / HISTOGRAM_BINS:.1f}-{(i + 1) / HISTOGRAM_BINS:.1f}", "count": count}
+                for i, count in enumerate(totals["confidence_histogram"])
+            ],
+            "detections_per_hour": hourly,
+            "detections_per_day": daily,
+            "potholes_created": totals["potholes_created"],
+            "reports_merged": totals["reports_merged"],
+        }
+
+
+# Shared counters used by the API
+detection_stats = DetectionStats()
@@ -1,99 +1,406 @@
+"""
+Email Alerts for Detected Potholes
+==================================
+
+- send_pothole_notification() - send one alert immediately (blocking)
+- notification_dispatcher     - background queue used by the API:
+  * one persistent SMTP connection, reused across emails
+  * retry with exponential backoff on SMTP errors
+  * optional digest: one email per EMAIL_DIGEST_SIZE potholes or
+    every EMAIL_DIGEST_MINUTES, whichever comes first (0 minutes: only
+    full digests, the remainder is flushed on shutdown)
+
+SMTP_HOST / SMTP_PORT / SMTP_STARTTLS point it at any server, e.g. a
+local stand-in for tests:
+    python -m aiosmtpd -n -l localhost:1025
+    SMTP_HOST=localhost SMTP_PORT=1025 SMTP_STARTTLS=0
+"""
+
 import os
+import queue
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
 from datetime import datetime
 from dotenv import load_dotenv
 
+from metrics import EMAIL_SEND_SECONDS
+
 # Load environment variables
 load_dotenv()
 
+# SMTP configuration
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "60"))  # Close idle connection after this
+
+# Dispatcher configuration
+EMAIL_DIGEST_SIZE = int(os.getenv("EMAIL_DIGEST_SIZE", "1"))  # 1 = one email per pothole
+EMAIL_DIGEST_MINUTES = float(os.getenv("EMAIL_DIGEST_MINUTES", "0"))  # 0 = no time window
+EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", "5"))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "2"))
+EMAIL_QUEUE_SIZE = int(os.getenv("EMAIL_QUEUE_SIZE", "1000"))
+
+
+def get_credentials():
+    """(sender, password, receiver) from the environment"""
+    return os.getenv("EMAIL_SENDER"), os.getenv("EMAIL_PASSWORD"), os.getenv("EMAIL_RECEIVER")
+
+
+def format_time(timestamp):
+    try:
+        dt_obj = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        return dt_obj.strftime("%Y-%m-%d %H:%M:%S")
+    except Exception:
+        return timestamp
+
+
+def attach_image(msg, image_path):
+    """Attach an image file to the message if it exists"""
+    if image_path and os.path.exists(image_path):
+        try:
+            with open(image_path, 'rb') as f:
+                img_data = f.read()
+                image = MIMEImage(img_data, name=os.path.basename(image_path))
+                msg.attach(image)
+            print(f"📎 Image attached: {os.path.basename(image_path)}")
+        except Exception as img_err:
+            print(f"⚠️ Could not attach image: {img_err}")
+    else:
+        print(f"⚠️ Image file not found at: {image_path}")
+
+
+def build_pothole_message(sender_email, receiver_email, pothole_id, latitude, longitude,
+                          confidence, timestamp, image_path):
+    """Build the alert email for one pothole"""
+    # Create Email Message
+    msg = MIMEMultipart()
+    msg['From'] = sender_email
+    msg['To'] = receiver_email
+    msg['Subject'] = f"🚨 POTHOLE ALERT: Detected with {confidence*100:.1f}% Confidence"
+
+    # Formatted Date
+    formatted_time = format_time(timestamp)
+
+    # Google Maps Link
+    maps_link = f"https://www.google.com/maps?q={latitude},{longitude}"
+
+    # Email Body
+    body = f"""
+    <html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="background: #f8f9fa; padding: 20px; border-radius: 10px; border: 1px solid #ddd;">
+            <h2 style="color: #d9534f; margin-top: 0;">🚨 Pothole Detected!</h2>
+
+            <p><strong>Pothole ID:</strong> #{pothole_id}</p>
+            <p><strong>Detection Time:</strong> {formatted_time}</p>
+            <p><strong>Confidence Score:</strong> <strong>{confidence*100:.1f}%</strong></p>
+
+            <hr style="border: 0; border-top: 1px solid #eee; margin: 20px 0;">
+
+            <h3 style="color: #4285f4; margin-bottom: 5px;">📍 Location Details</h3>
+            <p style="margin: 0;"><strong>Latitude:</strong> {latitude}</p>
+            <p style="margin: 0;"><strong>Longitude:</strong> {longitude}</p>
+
+            <div style="margin: 20px 0;">
+                <a href="{maps_link}" style="background-color: #4285f4; color: white; padding: 12px 20px; text-decoration: none; border-radius: 5px; font-weight: bold; display: inline-block;">
+                    🗺️ View on Google Maps
+                </a>
+            </div>
+
+            <p style="font-size: 0.9em; color: #777;">
+                Please check the attached image for visual verification.
+            </p>
+        </div>
+    </body>
+    </html>
+    """
+
+    msg.attach(MIMEText(body, 'html'))
+
+    # Attach Image (if exists)
+    attach_image(msg, image_path)
+    return msg
+
+
+def build_digest_message(sender_email, receiver_email, potholes):
+    """Build one summary email for several potholes"""
+    msg = MIMEMultipart()
+    msg['From'] = sender_email
+    msg['To'] = receiver_email
+    msg['Subject'] = f"🚨 POTHOLE ALERT: {len(potholes)} potholes detected"
+
+    rows = "".join(
+        f"""
+            <tr>
+                <td style="padding: 6px; border-bottom: 1px solid #eee;">#{p['pothole_id']}</td>
+                <td style="padding: 6px; border-bottom: 1px solid #eee;">{format_time(p['timestamp'])}</td>
+                <td style="padding: 6px; border-bottom: 1px solid #eee;">{p['confidence']*100:.1f}%</td>
+                <td style="padding: 6px; border-bottom: 1px solid #eee;">
+                    <a href="https://www.google.com/maps?q={p['latitude']},{p['longitude']}">{p['latitude']}, {p['longitude']}</a>
+                </td>
+            </tr>"""
+        for p in potholes
+    )
+    body = f"""
+    <html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="background: #f8f9fa; padding: 20px; border-radius: 10px; border: 1px solid #ddd;">
+            <h2 style="color: #d9534f; margin-top: 0;">🚨 {len(potholes)} Potholes Detected</h2>
+            <table style="border-collapse: collapse; width: 100%;">
+                <tr>
+                    <th align="left">ID</th><th align="left">Time</th>
+                    <th align="left">Confidence</th><th align="left">Location</th>
+                </tr>{rows}
+            </table>
+            <p style="font-size: 0.9em; color: #777;">
+                Images are attached in the same order.
+            </p>
+        </div>
+    </body>
+    </html>
+    """
+    msg.attach(MIMEText(body, 'html'))
+
+    for p in potholes:
+        attach_image(msg, p.get('image_path'))
+    return msg
+
+
+class SMTPConnection:
+    """Lazily opened SMTP session that is reused between sends"""
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, starttls=SMTP_STARTTLS, timeout=SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self.timeout = timeout
+        self._server = None
+        self.last_used = 0.0
+
+    def _open(self, sender_email, sender_password):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if sender_password:
+            server.login(sender_email, sender_password)
+        self._server = server
+        print(f"🔌 SMTP connected to {self.host}:{self.port}")
+
+    def send(self, msg, sender_email, sender_password):
+        """Send a message, reconnecting once if the session was dropped"""
+        started = time.perf_counter()
+        result = "error"
+        try:
+            if self._server is None:
+                self._open(sender_email, sender_password)
+            try:
+                self._server.send_message(msg)
+            except (smtplib.SMTPServerDisconnected, ConnectionError, OSError):
+                self.close()
+                self._open(sender_email, sender_password)
+                self._server.send_message(msg)
+            result = "ok"
+        finally:
+            EMAIL_SEND_SECONDS.observe(time.perf_counter() - started, result=result)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+    @property
+    def connected(self):
+        return self._server is not None
+
+
 def send_pothole_notification(pothole_id, latitude, longitude, confidence, timestamp, image_path):
     """
     Sends an email notification for a detected pothole.
     """
-    sender_email = os.getenv("EMAIL_SENDER")
-    sender_password = os.getenv("EMAIL_PASSWORD")
-    receiver_email = os.getenv("EMAIL_RECEIVER")
+    sender_email, sender_password, receiver_email = get_credentials()
 
-    if not sender_email or not sender_password or not receiver_email:
+    if not sender_email or not receiver_email:
         print("❌ Error: Missing email credentials in environment variables.")
         return False
 
     try:
-        # Create Email Message
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = receiver_email
-        msg['Subject'] = f"🚨 POTHOLE ALERT: Detected with {confidence*100:.1f}% Confidence"
-
-        # Formatted Date
-        try:
-            dt_obj = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
-            formatted_time = dt_obj.strftime("%Y-%m-%d %H:%M:%S")
-        except:
-            formatted_time = timestamp
-
-        # Google Maps Link
-        maps_link = f"https://www.google.com/maps?q={latitude},{longitude}"
-
-        # Email Body
-        body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="background: #f8f9fa; padding: 20px; border-radius: 10px; border: 1px solid #ddd;">
-                <h2 style="color: #d9534f; margin-top: 0;">🚨 Pothole Detected!</h2>
-                
-                <p><strong>Pothole ID:</strong> #{pothole_id}</p>
-                <p><strong>Detection Time:</strong> {formatted_time}</p>
-                <p><strong>Confidence Score:</strong> <strong>{confidence*100:.1f}%</strong></p>
-                
-                <hr style="border: 0; border-top: 1px solid #eee; margin: 20px 0;">
-                
-                <h3 style="color: #4285f4; margin-bottom: 5px;">📍 Location Details</h3>
-                <p style="margin: 0;"><strong>Latitude:</strong> {latitude}</p>
-                <p style="margin: 0;"><strong>Longitude:</strong> {longitude}</p>
-                
-                <div style="margin: 20px 0;">
-                    <a href="{maps_link}" style="background-color: #4285f4; color: white; padding: 12px 20px; text-decoration: none; border-radius: 5px; font-weight: bold; display: inline-block;">
-                        🗺️ View on Google Maps
-                    </a>
-                </div>
-
-                <p style="font-size: 0.9em; color: #777;">
-                    Please check the attached image for visual verification.
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        msg.attach(MIMEText(body, 'html'))
-
-        # Attach Image (if exists)
-        if image_path and os.path.exists(image_path):
-            try:
-                with open(image_path, 'rb') as f:
-                    img_data = f.read()
-                    image = MIMEImage(img_data, name=os.path.basename(image_path))
-                    msg.attach(image)
-                print(f"📎 Image attached: {os.path.basename(image_path)}")
-            except Exception as img_err:
-                print(f"⚠️ Could not attach image: {img_err}")
-        else:
-            print(f"⚠️ Image file not found at: {image_path}")
+        msg = build_pothole_message(sender_email, receiver_email, pothole_id, latitude, longitude,
+                                    confidence, timestamp, image_path)
 
         # Send via SMTP
         print(f"📧 Sending email to {receiver_email}...")
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
-        
+        connection = SMTPConnection()
+        try:
+            connection.send(msg, sender_email, sender_password)
+        finally:
+            connection.close()
+
         print("✅ Email Alert Sent Successfully!")
         return True
 
     except Exception as e:
         print(f"❌ Failed to send email: {e}")
         return False
+
+
+class NotificationDispatcher:
+    """
+    Background email sender.
+
+    enqueue() returns immediately; a worker thread batches alerts into
+    digests (if configured) and sends them over one reused SMTP connection.
+    """
+
+    def __init__(self, digest_size=EMAIL_DIGEST_SIZE, digest_minutes=EMAIL_DIGEST_MINUTES,
+                 max_retries=EMAIL_MAX_RETRIES, retry_base_seconds=EMAIL_RETRY_BASE_SECONDS,
+                 queue_size=EMAIL_QUEUE_SIZE):
+        self.digest_size = max(1, digest_size)
+        self.digest_seconds = digest_minutes * 60
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.connection = SMTPConnection()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        # Optional hook(image_path) -> path to attach, called on the worker
+        # thread (e.g. to wait for an image that is still being written)
+        self.prepare_image = None
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="email-dispatcher", daemon=True)
+                self._thread.start()
+
+    def enqueue(self, pothole_id, latitude, longitude, confidence, timestamp, image_path):
+        """Queue an alert; never blocks the caller"""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait({
+                "pothole_id": pothole_id,
+                "latitude": latitude,
+                "longitude": longitude,
+                "confidence": confidence,
+                "timestamp": timestamp,
+                "image_path": image_path,
+            })
+            return True
+        except queue.Full:
+            self.dropped += 1
+            print(f"⚠️ Email queue full, alert for pothole #{pothole_id} dropped")
+            return False
+
+    def _collect(self):
+        """Block for the first alert, then gather a digest (if enabled)"""
+        while True:
+            try:
+                first = self._queue.get(timeout=1.0)
+                break
+            except queue.Empty:
+                # Drop idle connections before the server does
+                if self.connection.connected and \
+                        time.monotonic() - self.connection.last_used > SMTP_IDLE_SECONDS:
+                    self.connection.close()
+                if self._stopping.is_set():
+                    return []
+
+        batch = [first]
+        if self.digest_size > 1:
+            # No time window: wait until the digest is full (or shutdown flushes it)
+            deadline = time.monotonic() + self.digest_seconds if self.digest_seconds > 0 else None
+            while len(batch) < self.digest_size and not self._stopping.is_set():
+                remaining = deadline - time.monotonic() if deadline is not None else 1.0
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=min(remaining, 1.0)))
+                except queue.Empty:
+                    continue
+        return batch
+
+    def _prepare_images(self, batch):
+        if self.prepare_image is None:
+            return
+        for alert in batch:
+            if alert["image_path"]:
+                try:
+                    alert["image_path"] = self.prepare_image(alert["image_path"])
+                except Exception as e:
+                    print(f"⚠️ Could not prepare image for pothole #{alert['pothole_id']}: {e}")
+
+    def _send_with_retry(self, batch):
+        self._prepare_images(batch)
+        sender_email, sender_password, receiver_email = get_credentials()
+        if not sender_email or not receiver_email:
+            print("❌ Error: Missing email credentials in environment variables.")
+            self.failed += len(batch)
+            return
+
+        if len(batch) == 1:
+            msg = build_pothole_message(sender_email, receiver_email, **batch[0])
+        else:
+            msg = build_digest_message(sender_email, receiver_email, batch)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                print(f"📧 Sending email to {receiver_email} ({len(batch)} pothole(s))...")
+                self.connection.send(msg, sender_email, sender_password)
+                self.sent += len(batch)
+                print("✅ Email Alert Sent Successfully!")
+                return
+            except Exception as e:
+                self.connection.close()
+                if attempt == self.max_retries or self._stopping.is_set():
+                    print(f"❌ Failed to send email after {attempt + 1} attempt(s): {e}")
+                    self.failed += len(batch)
+                    return
+                delay = min(300.0, self.retry_base_seconds * (2 ** attempt))
+                print(f"⚠️ Email send failed ({e}), retrying in {delay:.1f}s")
+                self._stopping.wait(delay)
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch:
+                self._send_with_retry(batch)
+                for _ in batch:
+                    self._queue.task_done()
+            if self._stopping.is_set() and self._queue.empty():
+                self.connection.close()
+                return
+
+    def stop(self, timeout=10.0):
+        """Flush queued alerts (up to timeout) and stop the worker"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.connection.close()
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "digest_size": self.digest_size,
+            "digest_minutes": self.digest_seconds / 60,
+        }
+
+
+# Shared dispatcher used by the API
+notification_dispatcher = NotificationDispatcher()
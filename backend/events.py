@@ -0,0 +1,143 @@
+"""
+Live Change Events
+==================
+
+Fan-out of the store's change log to Server-Sent Events subscribers
+(GET /potholes/events), so dashboards get updates without polling:
+- One tailer task per process reads store.changes() and pushes each change
+  to every subscriber. Writes in this process wake it immediately
+  (notify()); writes by other workers are picked up every
+  EVENTS_POLL_SECONDS, so N dashboards cost one change-log read, not N.
+- The change seq is the event id, so a reconnecting EventSource resumes
+  from Last-Event-ID by replaying the log.
+- Each subscriber has a bounded buffer (EVENTS_CLIENT_BUFFER). A client
+  that falls behind is not allowed to grow it: it is marked lagged and
+  catches up from the change log itself (or gets a reset when its
+  position is no longer in the log).
+"""
+
+import asyncio
+import os
+from typing import Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+
+from log import get_logger
+
+log = get_logger("events")
+
+EVENTS_POLL_SECONDS = float(os.getenv("EVENTS_POLL_SECONDS", "0.5"))
+EVENTS_CLIENT_BUFFER = int(os.getenv("EVENTS_CLIENT_BUFFER", "256"))
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+EVENTS_READ_LIMIT = 1000  # Changes per change-log read
+
+
+class Subscriber:
+    """One SSE connection's buffer of pending changes"""
+
+    def __init__(self, buffer: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, buffer))
+        self.lagged = False  # Buffer overflowed: catch up from the change log
+
+
+class ChangeBroadcaster:
+    """Tails the store's change log and fans changes out to subscribers"""
+
+    def __init__(self, store, poll_seconds: float = EVENTS_POLL_SECONDS,
+                 buffer: int = EVENTS_CLIENT_BUFFER):
+        self.store = store
+        self.poll_seconds = poll_seconds
+        self.buffer = buffer
+        self.seq = 0  # Last change delivered to subscribers
+        self.published = 0
+        self.lagged = 0
+        self._subscribers: Set[Subscriber] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+
+    async def _ensure_started(self):
+        """Start the tailer on first use and wait until it has its starting seq"""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._ready = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        await self._ready.wait()
+
+    def notify(self):
+        """A write happened in this process (any thread): publish it now"""
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wakeup.set)
+
+    async def subscribe(self) -> Subscriber:
+        """
+        Register a subscriber.
+        
+        Every change after self.seq (at return) will be queued, so a caller
+        that then replays the log from its own position misses nothing.
+        """
+        await self._ensure_started()
+        if not self._subscribers:
+            # The tailer idles without subscribers; start from the current end of the log
+            self.seq = await run_in_threadpool(self.store.current_seq)
+        subscriber = Subscriber(self.buffer)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    async def _run(self):
+        self.seq = await run_in_threadpool(self.store.current_seq)
+        self._ready.set()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._subscribers:
+                continue
+            try:
+                await self._publish_new()
+            except Exception as e:
+                log.error("❌ Error publishing pothole changes: %s", e)
+
+    async def _publish_new(self):
+        if await run_in_threadpool(self.store.current_seq) == self.seq:
+            return
+        while True:
+            changes, reset = await run_in_threadpool(self.store.changes, self.seq, EVENTS_READ_LIMIT)
+            if reset:
+                # Log trimmed or store replaced: every subscriber reloads
+                self.seq = await run_in_threadpool(self.store.current_seq)
+                self._fan_out({"reset": True, "seq": self.seq})
+                return
+            for change in changes:
+                self._fan_out(change)
+                self.seq = change["seq"]
+            if len(changes) < EVENTS_READ_LIMIT:
+                return
+
+    def _fan_out(self, change: dict):
+        self.published += 1
+        for subscriber in list(self._subscribers):
+            if subscriber.lagged:
+                continue
+            try:
+                subscriber.queue.put_nowait(change)
+            except asyncio.QueueFull:
+                subscriber.lagged = True
+                self.lagged += 1
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "seq": self.seq,
+            "published": self.published,
+            "lagged": self.lagged,
+        }
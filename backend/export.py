@@ -0,0 +1,109 @@
+"""
+Streaming Dataset Export
+========================
+
+Generators behind GET /potholes/export:
+- ndjson  - one JSON object per line
+- csv     - header + one row per pothole
+- geojson - FeatureCollection of Point features
+
+Records are pulled from the store one at a time and written out in
+~CHUNK_SIZE pieces, so memory stays constant however large the dataset
+is. gzip_chunks() compresses the stream on the fly.
+"""
+
+import csv
+import io
+import json
+import os
+import zlib
+from typing import Iterable, Iterator, List, Optional
+
+from storage import RECORD_FIELDS
+
+CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", str(64 * 1024)))
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "geojson": ("application/geo+json", "geojson"),
+}
+
+
+def parse_fields(value: Optional[str]) -> List[str]:
+    """Validate a comma-separated field projection (None -> every field)"""
+    if not value:
+        return list(RECORD_FIELDS)
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in RECORD_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)} (available: {', '.join(RECORD_FIELDS)})")
+    # Keep the requested order, drop repeats
+    return list(dict.fromkeys(fields))
+
+
+def _chunked(pieces: Iterable[str]) -> Iterator[bytes]:
+    """Join small strings into ~CHUNK_SIZE byte chunks"""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def _ndjson(records: Iterable[dict], fields: List[str]) -> Iterator[str]:
+    for record in records:
+        yield json.dumps({field: record[field] for field in fields}, separators=(",", ":")) + "\n"
+
+
+def _csv(records: Iterable[dict], fields: List[str]) -> Iterator[str]:
+    line = io.StringIO()
+    writer = csv.writer(line)
+    writer.writerow(fields)
+    for record in records:
+        writer.writerow(["" if record[field] is None else record[field] for field in fields])
+        yield line.getvalue()
+        line.seek(0)
+        line.truncate()
+    if line.getvalue():  # Empty dataset: header only
+        yield line.getvalue()
+
+
+def _geojson(records: Iterable[dict], fields: List[str]) -> Iterator[str]:
+    properties = [field for field in fields if field not in ("latitude", "longitude")]
+    yield '{"type":"FeatureCollection","features":['
+    separator = ""
+    for record in records:
+        feature = {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [record["longitude"], record["latitude"]]},
+            "properties": {field: record[field] for field in properties},
+        }
+        if "id" in fields:
+            feature["id"] = record["id"]
+        yield separator + json.dumps(feature, separators=(",", ":"))
+        separator = ","
+    yield "]}\n"
+
+
+WRITERS = {"ndjson": _ndjson, "csv": _csv, "geojson": _geojson}
+
+
+def export_chunks(records: Iterable[dict], fmt: str, fields: List[str]) -> Iterator[bytes]:
+    """Encode records in the given format as a stream of byte chunks"""
+    return _chunked(WRITERS[fmt](records, fields))
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """gzip-compress a byte stream on the fly"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,141 @@
+"""
+Detection Image Storage
+=======================
+
+Writes annotated detection images off the request path:
+- Files are named by a hash of the image content, so concurrent
+  detections never overwrite each other and identical frames share a file
+- Sharded as <images dir>/ab/cd/<hash>.jpg (256 x 256 directories), so
+  no directory grows to millions of entries
+- JPEG encoding and the write run on a small background pool; save()
+  returns the final path immediately. Writes go to a temp file and are
+  renamed into place, so readers never see a partial image.
+
+When more than IMAGE_WRITER_QUEUE_SIZE writes are pending, save() writes
+synchronously instead of queueing more frames in memory.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+from metrics import IMAGE_WRITE_SECONDS
+from log import get_logger
+
+log = get_logger("images")
+
+IMAGES_DIR = os.path.join(os.getenv("DATA_DIR", "."), "detected_potholes")
+IMAGE_WRITER_WORKERS = int(os.getenv("IMAGE_WRITER_WORKERS", "2"))
+IMAGE_WRITER_QUEUE_SIZE = int(os.getenv("IMAGE_WRITER_QUEUE_SIZE", "64"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "90"))
+
+
+def content_name(image: np.ndarray) -> str:
+    """Sharded relative path for an image: ab/cd/<hash>.jpg"""
+    digest = hashlib.blake2b(str(image.shape).encode(), digest_size=16)
+    digest.update(np.ascontiguousarray(image).data)
+    name = digest.hexdigest()
+    return os.path.join(name[:2], name[2:4], f"{name}.jpg")
+
+
+class ImageWriter:
+    """Background JPEG writer with content-addressed, sharded file names"""
+
+    def __init__(self, images_dir: str = IMAGES_DIR, workers: int = IMAGE_WRITER_WORKERS,
+                 queue_size: int = IMAGE_WRITER_QUEUE_SIZE):
+        self.images_dir = images_dir
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.written = 0
+        self.deduplicated = 0
+        self.failed = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix="image-writer")
+        return self._executor
+
+    def save(self, image: np.ndarray) -> str:
+        """
+        Queue an image for writing and return its final path.
+
+        The caller must not modify `image` afterwards.
+        """
+        path = os.path.join(self.images_dir, content_name(image))
+        with self._lock:
+            if path in self._pending or os.path.exists(path):
+                self.deduplicated += 1
+                return path
+            if len(self._pending) >= self.queue_size:
+                future = None  # Backlog full: write in the caller's thread
+            else:
+                future = self._get_executor().submit(self._write, image, path)
+                self._pending[path] = future
+        if future is None:
+            self._write(image, path)
+        else:
+            future.add_done_callback(lambda _: self._done(path))
+        return path
+
+    def _done(self, path: str):
+        with self._lock:
+            self._pending.pop(path, None)
+
+    def _write(self, image: np.ndarray, path: str):
+        started = time.perf_counter()
+        try:
+            ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, IMAGE_JPEG_QUALITY])
+            if not ok:
+                raise ValueError("JPEG encoding failed")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(encoded.tobytes())
+            os.replace(tmp_path, path)
+            self.written += 1
+        except Exception as e:
+            self.failed += 1
+            log.error("❌ Could not write image %s: %s", path, e)
+        finally:
+            IMAGE_WRITE_SECONDS.observe(time.perf_counter() - started)
+
+    def wait(self, path: str, timeout: Optional[float] = None) -> bool:
+        """Wait for a queued write of `path`; True if the file exists"""
+        with self._lock:
+            future = self._pending.get(path)
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                return False
+        return os.path.exists(path)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": len(self._pending),
+            "queue_size": self.queue_size,
+            "written": self.written,
+            "deduplicated": self.deduplicated,
+            "failed": self.failed,
+        }
+
+    def shutdown(self):
+        """Finish queued writes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# Shared writer used by the detector
+image_writer = ImageWriter()
@@ -0,0 +1,136 @@
+"""
+Inference Worker Pool
+=====================
+
+Runs CPU-bound YOLO inference off the asyncio event loop.
+- A dedicated thread (or process) pool, separate from the pool FastAPI
+  uses for sync endpoints, so /potholes reads never wait behind inference
+- Bounded: at most INFERENCE_WORKERS running + INFERENCE_QUEUE_SIZE
+  waiting; beyond that InferenceQueueFull is raised (-> 503 Retry-After)
+- stats() exposes running/queued depth for monitoring and load shedding
+
+With INFERENCE_EXECUTOR=process every worker is its own single-process
+executor and jobs with a key (the client id) always go to the same one:
+the frame cache and tracker live in each worker process, so all of a
+client's frames must reach the same copy. start(initializer) launches
+the workers up front and runs the initializer (model warm-up) in each.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import count
+from typing import Callable, List, Optional
+
+# Configuration
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread").lower()  # thread | process
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "8"))
+INFERENCE_RETRY_AFTER = int(os.getenv("INFERENCE_RETRY_AFTER", "2"))  # seconds
+
+
+class InferenceQueueFull(Exception):
+    """Raised when every worker is busy and the wait queue is full"""
+
+
+class InferencePool:
+    """Bounded executor for inference jobs"""
+
+    def __init__(self, workers: int = INFERENCE_WORKERS, queue_size: int = INFERENCE_QUEUE_SIZE,
+                 kind: str = INFERENCE_EXECUTOR):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown INFERENCE_EXECUTOR: {kind}")
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.kind = kind
+        self.initializer: Optional[Callable[[], None]] = None  # Run in each worker process
+        self._executor: Optional[Executor] = None  # Thread pool
+        self._processes: List[Executor] = []  # One single-process executor per worker
+        self._next = count()  # Round robin for jobs without a key
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    def _get_executor(self, key: Optional[str] = None) -> Executor:
+        if self.kind == "process":
+            with self._lock:
+                if not self._processes:
+                    # Each process loads its own copy of the model
+                    self._processes = [ProcessPoolExecutor(max_workers=1, initializer=self.initializer)
+                                       for _ in range(self.workers)]
+            index = next(self._next) if key is None else hash(key)
+            return self._processes[index % self.workers]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix="inference")
+        return self._executor
+
+    def start(self, initializer: Optional[Callable[[], None]] = None):
+        """Launch the worker processes now, running initializer in each (no-op for threads)"""
+        if self.kind != "process":
+            return
+        self.initializer = initializer
+        self._get_executor()
+        for executor in self._processes:
+            executor.submit(int)  # Processes start on their first job
+
+    def _acquire(self):
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self.rejected += 1
+                raise InferenceQueueFull(
+                    f"Inference queue full ({self._in_flight}/{self.capacity})"
+                )
+            self._in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self.completed += 1
+
+    async def run(self, fn, *args, key: Optional[str] = None):
+        """
+        Run fn(*args) on the pool; raises InferenceQueueFull when saturated.
+
+        Jobs with the same key run in the same worker process.
+        """
+        self._acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(key), fn, *args)
+        finally:
+            self._release()
+
+    def queue_depth(self) -> int:
+        """Jobs waiting for a worker"""
+        return max(0, self._in_flight - self.workers)
+
+    def stats(self) -> dict:
+        in_flight = self._in_flight
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "running": min(in_flight, self.workers),
+            "queued": max(0, in_flight - self.workers),
+            "queue_size": self.queue_size,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        for executor in self._processes:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._processes = []
+
+
+# Shared pool used by the API
+inference_pool = InferencePool()
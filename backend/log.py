@@ -0,0 +1,92 @@
+"""
+Leveled, Rate-Limited Logging
+=============================
+
+Replacement for print() on hot paths (per frame, per box):
+- LOG_LEVEL=DEBUG|INFO|WARNING|ERROR (default INFO)
+- Messages are %-style and only formatted when the level is enabled, so
+  a disabled log.debug(...) costs one comparison
+- At most LOG_RATE_LIMIT messages per LOG_RATE_WINDOW seconds per call
+  site (message template); the rest are counted and reported as
+  "(N similar messages suppressed)" on the next one that gets through
+
+Usage:
+    from log import get_logger
+    log = get_logger("detector")
+    log.debug("Detection %d: confidence %.2f", i, conf)
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_RATE_LIMIT = int(os.getenv("LOG_RATE_LIMIT", "10"))
+LOG_RATE_WINDOW = float(os.getenv("LOG_RATE_WINDOW", "10"))
+
+_handler = logging.StreamHandler(sys.stdout)
+_handler.setFormatter(logging.Formatter("%(message)s"))
+_root = logging.getLogger("pothole")
+_root.addHandler(_handler)
+_root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+_root.propagate = False
+
+
+class RateLimitedLogger:
+    """Wraps a logging.Logger with a per-template rate limit"""
+
+    def __init__(self, logger: logging.Logger, limit: int = LOG_RATE_LIMIT,
+                 window: float = LOG_RATE_WINDOW):
+        self._logger = logger
+        self.limit = limit
+        self.window = window
+        self._lock = threading.Lock()
+        # template -> [window start, emitted in window, suppressed]
+        self._windows = {}
+
+    def _allow(self, msg: str):
+        """(allowed, suppressed count to report)"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(msg)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[2] if state else 0
+                self._windows[msg] = [now, 1, 0]
+                return True, suppressed
+            if state[1] < self.limit:
+                state[1] += 1
+                return True, 0
+            state[2] += 1
+            return False, 0
+
+    def _log(self, level: int, msg: str, args):
+        if not self._logger.isEnabledFor(level):
+            return
+        allowed, suppressed = self._allow(msg)
+        if not allowed:
+            return
+        if suppressed:
+            msg = f"{msg} (%d similar messages suppressed)"
+            args = args + (suppressed,)
+        self._logger.log(level, msg, *args)
+
+    def debug(self, msg: str, *args):
+        self._log(logging.DEBUG, msg, args)
+
+    def info(self, msg: str, *args):
+        self._log(logging.INFO, msg, args)
+
+    def warning(self, msg: str, *args):
+        self._log(logging.WARNING, msg, args)
+
+    def error(self, msg: str, *args):
+        self._log(logging.ERROR, msg, args)
+
+    def enabled(self, level: int) -> bool:
+        return self._logger.isEnabledFor(level)
+
+
+def get_logger(name: str) -> RateLimitedLogger:
+    return RateLimitedLogger(_root.getChild(name))
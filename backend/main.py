@@ -6,18 +6,26 @@ FastAPI backend with:
 - POST /potholes - Save pothole data
 - GET /potholes - Retrieve all potholes
 - POST /detect - ML-based pothole detection from image
+- WS /detect/stream - continuous detection over one WebSocket
+- GET /potholes/events - live changes as Server-Sent Events
 - CORS enabled for frontend access
-- CSV storage + image storage
+- SQLite (or legacy CSV) storage + image storage
 """
 
-from fastapi import FastAPI, HTTPException, File, UploadFile
+from fastapi import FastAPI, HTTPException, File, UploadFile, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from typing import List, Optional
-import csv
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import List, Optional, Union
 import os
-from datetime import datetime
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
 import base64
 from dotenv import load_dotenv
 
@@ -25,14 +33,32 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import ML detector
-from ml_detector import detect_pothole, get_detection_stats
+import ml_detector
+from ml_detector import detect_pothole, get_detection_stats, count_saved_images, batcher, warmup_model, warmup_worker
+from inference_pool import inference_pool, InferenceQueueFull, INFERENCE_RETRY_AFTER
+
+# Import storage layer
+from storage import get_store, new_record, merge_hit, select_records, sort_key, SORT_FIELDS, DATA_DIR
+from spatial_index import GridIndex
+from tiles import TileCache, MAX_ZOOM, build_tile, tile_bounds
+from export import EXPORT_FORMATS, export_chunks, gzip_chunks, parse_fields
+from thumbnails import DERIVED_FORMATS, IMAGE_SIZES, get_derived, remove_derived
+from image_store import image_writer
+from detection_stats import detection_stats
+from events import EVENTS_KEEPALIVE_SECONDS, EVENTS_READ_LIMIT, ChangeBroadcaster
+from record_cache import CACHE_SORTS, RECORD_CACHE, RecordCache
+from metrics import (DETECT_STAGE_SECONDS, FRAME_CACHE_REQUESTS, HTTP_REQUEST_SECONDS, STORAGE_SECONDS,
+                     STREAM_FRAMES, TRACKS_CONFIRMED, Gauge, instrument, render_metrics)
+from log import get_logger
+
+log = get_logger("api")
 
 # Import Email Notifier
 try:
-    from email_notifier import send_pothole_notification
+    from email_notifier import notification_dispatcher
 except ImportError:
-    print("⚠️ Email notifier not found or dependencies missing.")
-    send_pothole_notification = None
+    log.warning("⚠️ Email notifier not found or dependencies missing.")
+    notification_dispatcher = None
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -51,17 +77,34 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all HTTP methods
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["ETag", "X-Change-Seq", "X-Next-After-Id"],  # Readable by the dashboards' fetch()
 )
 
+@app.middleware("http")
+async def record_request_time(request: Request, call_next):
+    """Request latency per route template for /metrics"""
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - started,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=response.status_code,
+    )
+    return response
+
 # ============================================
-# Static Files for Images
+# Detection Images
 # ============================================
 # Use persistent disk for images in production, local directory in development
 IMAGES_DIR = os.path.join(os.getenv("DATA_DIR", "."), "detected_potholes")
 # Create directory if it doesn't exist
 os.makedirs(IMAGES_DIR, exist_ok=True)
-# Mount static files to serve images
-app.mount("/detected_potholes", StaticFiles(directory=IMAGES_DIR), name="detected_potholes")
+# Served by GET /detected_potholes/{name} (originals and ?size= derivatives)
+IMAGE_CACHE_SECONDS = int(os.getenv("IMAGE_CACHE_SECONDS", str(30 * 24 * 3600)))
+# Longest wait for an image that is still being written in the background
+IMAGE_WAIT_SECONDS = 5.0
 
 # Data Models
 # ============================================
@@ -91,8 +134,24 @@ class Pothole(BaseModel):
     latitude: float
     longitude: float
     timestamp: str
-    confidence: Optional[float] = None
-    image_path: Optional[str] = None
+    confidence: Optional[float] = None    # Highest confidence reported
+    image_path: Optional[str] = None      # Image of the best report
+    hit_count: int = 1                    # Number of merged reports
+    last_seen: Optional[str] = None       # Timestamp of the latest report
+
+class BatchItemResult(BaseModel):
+    """Outcome of one item of a batch upload"""
+    index: int                   # Position in the uploaded array / NDJSON stream
+    status: str                  # "created", "merged" or "error"
+    id: Optional[int] = None     # Pothole the report was stored as / merged into
+    error: Optional[str] = None
+
+class BatchResult(BaseModel):
+    """Result of POST /potholes/batch"""
+    created: int
+    merged: int
+    failed: int
+    results: List[BatchItemResult]
 
 class DetectionResult(BaseModel):
     """Model for ML detection result"""
@@ -101,39 +160,180 @@ class DetectionResult(BaseModel):
     bbox: Optional[List[float]] = None
     image_filename: Optional[str] = None
     image_path: Optional[str] = None  # Full path with directory
+    cached: bool = False  # Reused the result of a near-identical recent frame
+    tracking: bool = False  # Multi-frame confirmation is on: report only when confirmed
+    confirmed: bool = False  # This frame confirmed a pothole (image = its best frame)
     message: str
 
+class PotholeChange(BaseModel):
+    """One entry of the change log"""
+    seq: int
+    op: str                            # "insert", "update" or "delete"
+    id: int
+    pothole: Optional[Pothole] = None  # Current record for inserts/updates (None if since deleted)
+
+class ChangesResponse(BaseModel):
+    """Changes since a sequence number"""
+    seq: int          # Pass as ?since= on the next call
+    reset: bool       # True: cursor too old, reload GET /potholes
+    has_more: bool
+    changes: List[PotholeChange]
+
+class PotholeSummary(BaseModel):
+    """Dataset aggregates for dashboard stats bars"""
+    seq: int                          # Dataset version (as X-Change-Seq)
+    count: int
+    avg_confidence: float             # Mean over all potholes, missing confidence counts as 0
+    since_count: Optional[int] = None  # Potholes reported at/after ?since=
+
+# ============================================
+# Storage Configuration
+# ============================================
+
+# Backend is chosen by STORAGE_BACKEND (sqlite by default, csv for the legacy layout)
+store = get_store()
+# Every store call shows up in /metrics as pothole_storage_seconds{op=...}
+instrument(store, ["create", "get", "get_many", "record_hit", "ingest", "delete", "count",
+                   "current_seq", "changes", "query", "references_image", "summary"], STORAGE_SECONDS, backend=store.name)
+
+# In-memory spatial index over (id, lat, lon, confidence)
+spatial_index = GridIndex()
+
+# Columnar, pre-serialized copy of the table for plain GET /potholes lists
+record_cache = RecordCache(store) if RECORD_CACHE else None
+
+# Live change feed for GET /potholes/events (writes call broadcaster.notify())
+broadcaster = ChangeBroadcaster(store)
+
+# Per-tile cluster cache for the map, invalidated per point on create/delete
+tile_cache = TileCache()
+
+# Change sequence the index/tile cache reflect. Writes from other workers
+# are picked up from the store's change log before each spatial query.
+index_seq = 0
+index_lock = threading.Lock()
+
+def ensure_spatial_index():
+    """Build the spatial index on first use, then catch up with the change log"""
+    global index_seq
+    with index_lock:
+        latest = store.current_seq()
+        if spatial_index.loaded and latest == index_seq:
+            return spatial_index
+        
+        changes, reset = ([], True) if not spatial_index.loaded else store.changes(index_seq)
+        if reset:
+            spatial_index.load(store.iter_all())
+            tile_cache.clear()
+            index_seq = latest
+            return spatial_index
+        
+        for change in changes:
+            point = spatial_index.get(change["id"])
+            if point is not None:
+                tile_cache.invalidate_point(point[0], point[1])
+            if change["op"] == "delete" or change["pothole"] is None:
+                spatial_index.remove(change["id"])
+            else:
+                record = change["pothole"]
+                spatial_index.insert(record["id"], record["latitude"], record["longitude"],
+                                     record["confidence"])
+                tile_cache.invalidate_point(record["latitude"], record["longitude"])
+            index_seq = change["seq"]
+        return spatial_index
+
 # ============================================
-# CSV Storage Configuration
+# Duplicate Report Merging
 # ============================================
 
-# Use persistent disk path if available (production), otherwise use local path (development)
-DATA_DIR = os.getenv("DATA_DIR", ".")  # /data in production, current dir in development
-CSV_FILE = os.path.join(DATA_DIR, "potholes.csv")
-CSV_HEADERS = ["id", "latitude", "longitude", "timestamp", "confidence", "image_path"]
-
-def initialize_csv():
-    """Create CSV file with headers if it doesn't exist"""
-    # Ensure data directory exists
-    os.makedirs(DATA_DIR, exist_ok=True)
-    
-    if not os.path.exists(CSV_FILE):
-        with open(CSV_FILE, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(CSV_HEADERS)
-        print(f"✅ Created new CSV file: {CSV_FILE}")
-
-def get_next_id():
-    """Get the next available ID for a new pothole"""
-    if not os.path.exists(CSV_FILE):
-        return 1
-    
-    with open(CSV_FILE, 'r') as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-        if not rows:
-            return 1
-        return int(rows[-1]['id']) + 1
+# A phone re-detects the same pothole every interval while it is in view;
+# reports this close in space and time are merged (DEDUP_RADIUS_M=0 disables)
+DEDUP_RADIUS_M = float(os.getenv("DEDUP_RADIUS_M", "10"))
+DEDUP_WINDOW_MINUTES = float(os.getenv("DEDUP_WINDOW_MINUTES", "30"))
+merge_lock = threading.Lock()
+# Largest accepted POST /potholes/batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO-8601 timestamp (naive values are taken as UTC)"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def find_duplicate(pothole: PotholeCreate, index: Optional[GridIndex] = None,
+                   records: Optional[dict] = None) -> Optional[dict]:
+    """
+    Nearest pothole within the merge radius and time window
+    
+    Searches the stored potholes, or `index` + `records` (id -> record)
+    for reports that are not stored yet.
+    """
+    if DEDUP_RADIUS_M <= 0:
+        return None
+    reported_at = parse_timestamp(pothole.timestamp)
+    if reported_at is None:
+        return None
+    
+    if index is None:
+        index = ensure_spatial_index()
+    hits = index.query_radius(pothole.latitude, pothole.longitude, DEDUP_RADIUS_M)
+    if not hits:
+        return None
+    
+    window = timedelta(minutes=DEDUP_WINDOW_MINUTES)
+    if records is None:
+        records = {record["id"]: record for record in store.get_many([pid for pid, _ in hits])}
+    for pothole_id, _ in hits:  # nearest first
+        record = records.get(pothole_id)
+        if record is None:
+            continue
+        last_seen = parse_timestamp(record["last_seen"] or record["timestamp"])
+        if last_seen is not None and abs(reported_at - last_seen) <= window:
+            return record
+    return None
+
+def remove_image(image_path: Optional[str]):
+    """Delete a detection image that no record references any more (only inside IMAGES_DIR)"""
+    if not image_path:
+        return
+    # image_path can come from a client's POST body: never delete outside IMAGES_DIR
+    name = os.path.relpath(os.path.realpath(image_path), os.path.realpath(IMAGES_DIR))
+    if name.startswith(".."):
+        log.warning("⚠️ Refusing to delete image outside %s: %s", IMAGES_DIR, image_path)
+        return
+    # Identical frames share one file (content-addressed names, frame cache),
+    # so unrelated records can point at it. merge_lock: no report of this
+    # process can start referencing it between the check and the delete.
+    with merge_lock:
+        if store.references_image(image_path):
+            log.debug("🖼️ Image still referenced, kept: %s", image_path)
+            return
+        remove_derived(IMAGES_DIR, image_path)
+        if os.path.exists(image_path):
+            try:
+                os.remove(image_path)
+                log.info("🗑️ Deleted image: %s", image_path)
+            except Exception as img_err:
+                log.warning("⚠️ Could not delete image: %s", img_err)
+
+def make_etag(seq: int, request: Request) -> str:
+    """Weak ETag for a listing: dataset version + query string"""
+    query = hashlib.md5(str(request.query_params).encode()).hexdigest()[:8]
+    return f'W/"{seq}-{query}"'
+
+def parse_floats(value: str, count: int, name: str) -> List[float]:
+    """Parse a comma-separated list of floats from a query parameter"""
+    try:
+        numbers = [float(part) for part in value.split(",")]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count:
+        raise HTTPException(status_code=400, detail=f"{name} must be {count} comma-separated numbers")
+    return numbers
 
 # ============================================
 # API Endpoints
@@ -147,15 +347,127 @@ def read_root():
         "version": "1.0.0",
         "endpoints": {
             "POST /potholes": "Create new pothole entry",
-            "GET /potholes": "Get all potholes"
+            "POST /potholes/batch": "Create many potholes (JSON array or NDJSON)",
+            "GET /potholes": "Get potholes (?bbox=, ?near=&radius_m=, ?sort=&order=, ?after_id=&limit=, ?fields=)",
+            "GET /potholes/{id}": "Get one pothole",
+            "GET /potholes/changes?since=": "Inserts/deletes since a change sequence",
+            "GET /potholes/summary?since=": "Count, mean confidence and count since a timestamp",
+            "GET /potholes/export?format=": "Stream the whole dataset (ndjson, csv or geojson)",
+            "GET /potholes/tiles/{z}/{x}/{y}": "Clustered potholes for one map tile",
+            "DELETE /potholes/{id}": "Delete a pothole",
+            "GET /detected_potholes/{name}?size=": "Detection image (original, thumb or medium)",
+            "GET /metrics": "Prometheus metrics"
         }
     }
 
+def prepare_alert_image(img_path: str) -> str:
+    """
+    Absolute path of an alert's image, once it is on disk.
+    
+    Runs on the email dispatcher's worker (not the request thread): the
+    detection image may still be queued in the background writer.
+    """
+    image_writer.wait(img_path, timeout=IMAGE_WAIT_SECONDS)
+    
+    # Convert to absolute path if relative
+    if not os.path.isabs(img_path):
+        img_path = os.path.abspath(img_path)
+        log.debug("🔍 Converted to absolute path: %s", img_path)
+
+    # Verify file exists
+    if os.path.exists(img_path):
+        log.debug("✅ Image file found at: %s", img_path)
+    else:
+        log.warning("❌ Image file NOT found at: %s", img_path)
+        # Recorded under another DATA_DIR/CWD: look up its sharded name (ab/cd/<hash>.jpg) in IMAGES_DIR
+        normalized = img_path.replace("\\", "/")
+        prefix = "detected_potholes/"
+        at = normalized.rfind(prefix)
+        name = normalized[at + len(prefix):] if at != -1 else os.path.basename(normalized)
+        alt_path = os.path.abspath(os.path.join(IMAGES_DIR, *name.split("/")))
+        if os.path.exists(alt_path):
+            img_path = alt_path
+            log.debug("✅ Found image at alternative path: %s", img_path)
+        else:
+            log.warning("❌ Alternative path also failed: %s", alt_path)
+    return img_path
+
+if notification_dispatcher:
+    notification_dispatcher.prepare_image = prepare_alert_image
+
+def queue_email_alert(record: dict):
+    """Queue an email alert for a newly stored pothole (sent by a background worker)"""
+    if notification_dispatcher:
+        try:
+            log.debug("📧 Queueing email alert...")
+            notification_dispatcher.enqueue(
+                pothole_id=record["id"],
+                latitude=record["latitude"],
+                longitude=record["longitude"],
+                confidence=record["confidence"],
+                timestamp=record["timestamp"],
+                image_path=record["image_path"]
+            )
+        except Exception as email_err:
+            log.warning("⚠️ Email alert failed (but pothole saved): %s", email_err)
+
+def save_pothole(pothole: PotholeCreate):
+    """
+    Store a report, merging it into a nearby recent pothole if there is one
+    
+    Returns:
+        (record, merged) - merged is True when an existing pothole was updated
+    """
+    with merge_lock:
+        duplicate = find_duplicate(pothole)
+        record = None
+        if duplicate is not None:
+            record = store.record_hit(
+                duplicate["id"],
+                confidence=pothole.confidence,
+                timestamp=pothole.timestamp,
+                image_path=pothole.image_path
+            )
+        
+        if record is None:
+            duplicate = None  # Deleted meanwhile (another worker)
+            # Insert (ID is assigned by the store)
+            record = store.create(
+                latitude=pothole.latitude,
+                longitude=pothole.longitude,
+                timestamp=pothole.timestamp,
+                confidence=pothole.confidence,
+                image_path=pothole.image_path
+            )
+        ensure_spatial_index()
+    broadcaster.notify()
+    
+    if duplicate is not None:
+        # Only the best image of a pothole is kept
+        if record["image_path"] != duplicate["image_path"]:
+            remove_image(duplicate["image_path"])
+        elif pothole.image_path and pothole.image_path != record["image_path"]:
+            remove_image(pothole.image_path)
+        log.debug("🔁 Report merged into pothole #%d (hits: %d)", record["id"], record["hit_count"])
+        detection_stats.record_potholes(merged=1)
+        return record, True
+    
+    detection_stats.record_potholes(created=1)    
+    log.info("✅ Pothole #%d saved: (%s, %s)", record["id"], pothole.latitude, pothole.longitude)
+    if pothole.confidence:
+        log.debug("   Confidence: %.2f%%, Image: %s", pothole.confidence * 100, pothole.image_path)
+        queue_email_alert(record)
+    return record, False
+
 @app.post("/potholes", response_model=Pothole, status_code=201)
-def create_pothole(pothole: PotholeCreate):
+def create_pothole(pothole: PotholeCreate, response: Response):
     """
     Create a new pothole entry
     
+    A report within DEDUP_RADIUS_M and DEDUP_WINDOW_MINUTES of an existing
+    pothole updates that pothole (hit_count, max confidence, last_seen)
+    and returns 200 instead of 201.
+    
     Args:
         pothole: PotholeCreate object with latitude, longitude, timestamp
         
@@ -163,120 +475,520 @@ def create_pothole(pothole: PotholeCreate):
         Pothole object with assigned ID
     """
     try:
-        # Initialize CSV if needed
-        initialize_csv()
+        record, merged = save_pothole(pothole)
+        if merged:
+            response.status_code = 200
+        return Pothole(**record)
         
-        # Get next ID
-        pothole_id = get_next_id()
+    except Exception as e:
+        log.error("❌ Error saving pothole: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to save pothole: {str(e)}")
+
+def save_batch(items: list) -> BatchResult:
+    """
+    Store a batch of reports with a single store write
+    
+    items are PotholeCreate objects, or error messages for items rejected
+    while parsing. Reports are merged into stored potholes - or into an
+    earlier report of the same batch - exactly like single POSTs.
+    """
+    reports = []          # New records; their "id" is their position until stored
+    pending = GridIndex()  # Locations of the new records
+    hits = []             # Repeat reports of stored potholes
+    targets = []          # Per item: (index, kind, position in reports/hits)
+    replaced_images = set()
+    
+    with merge_lock:
+        for i, item in enumerate(items):
+            if isinstance(item, str):
+                targets.append((i, "error", item))
+                continue
+            
+            duplicate = find_duplicate(item)
+            if duplicate is not None:
+                hits.append({
+                    "id": duplicate["id"],
+                    "confidence": item.confidence,
+                    "timestamp": item.timestamp,
+                    "image_path": item.image_path,
+                })
+                replaced_images.update((duplicate["image_path"], item.image_path))
+                targets.append((i, "hit", len(hits) - 1))
+                continue
+            
+            duplicate = find_duplicate(item, pending, dict(enumerate(reports)))
+            if duplicate is not None:
+                position = duplicate["id"]
+                reports[position] = merge_hit(duplicate, item.confidence, item.timestamp, item.image_path)
+                replaced_images.update((duplicate["image_path"], item.image_path))
+                targets.append((i, "merged", position))
+                continue
+            
+            position = len(reports)
+            reports.append(new_record(position, item.latitude, item.longitude, item.timestamp,
+                                      item.confidence, item.image_path))
+            pending.insert(position, item.latitude, item.longitude)
+            targets.append((i, "created", position))
         
-        # Write to CSV
-        with open(CSV_FILE, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                pothole_id,
-                pothole.latitude,
-                pothole.longitude,
-                pothole.timestamp,
-                pothole.confidence if pothole.confidence else "",
-                pothole.image_path if pothole.image_path else ""
-            ])
+        created, updated = store.ingest(reports, hits) if reports or hits else ([], [])
         
-        print(f"✅ Pothole #{pothole_id} saved: ({pothole.latitude}, {pothole.longitude})")
-        if pothole.confidence:
-            print(f"   Confidence: {pothole.confidence:.2%}, Image: {pothole.image_path}")
-            
-            # Trigger Email Alert (Non-blocking)
-            if send_pothole_notification:
-                try:
-                    # Run in background or just call (SMTP might delay response slightly)
-                    print("📧 Initiating email alert...")
-                    
-                    # Ensure absolute path for image attachment
-                    img_path = pothole.image_path
-                    print(f"🔍 Original image path: {img_path}")
-                    
-                    if img_path:
-                        # Convert to absolute path if relative
-                        if not os.path.isabs(img_path):
-                            img_path = os.path.abspath(img_path)
-                            print(f"🔍 Converted to absolute path: {img_path}")
-                        
-                        # Verify file exists
-                        if os.path.exists(img_path):
-                            print(f"✅ Image file found at: {img_path}")
-                        else:
-                            print(f"❌ Image file NOT found at: {img_path}")
-                            print(f"🔍 Current working directory: {os.getcwd()}")
-                            # Try to find the file in detected_potholes folder
-                            filename = os.path.basename(img_path)
-                            alt_path = os.path.join(os.getcwd(), "detected_potholes", filename)
-                            if os.path.exists(alt_path):
-                                img_path = alt_path
-                                print(f"✅ Found image at alternative path: {img_path}")
-                            else:
-                                print(f"❌ Alternative path also failed: {alt_path}")
-
-                    send_pothole_notification(
-                        pothole_id=pothole_id,
-                        latitude=pothole.latitude,
-                        longitude=pothole.longitude,
-                        confidence=pothole.confidence,
-                        timestamp=pothole.timestamp,
-                        image_path=img_path
-                    )
-                except Exception as email_err:
-                    print(f"⚠️ Email alert failed (but pothole saved): {email_err}")
-                    import traceback
-                    traceback.print_exc()
-                
-        # Return created pothole with ID
-        return Pothole(
-            id=pothole_id,
-            latitude=pothole.latitude,
-            longitude=pothole.longitude,
-            timestamp=pothole.timestamp,
-            confidence=pothole.confidence,
-            image_path=pothole.image_path
+        # Repeat reports of a pothole deleted meanwhile are stored as new
+        # potholes, like save_pothole() does
+        orphans = [(index, position) for index, kind, position in targets
+                   if kind == "hit" and updated[position] is None]
+        recreated = {}
+        if orphans:
+            records = [new_record(None, items[index].latitude, items[index].longitude, items[index].timestamp,
+                                  items[index].confidence, items[index].image_path)
+                       for index, _ in orphans]
+            stored, _ = store.ingest(records, [])
+            recreated = {position: record for (_, position), record in zip(orphans, stored)}
+            created += stored
+        ensure_spatial_index()
+    broadcaster.notify()
+    
+    # Only the best image of each pothole is kept
+    final = {record["id"]: record for record in created + [r for r in updated if r]}
+    kept = {record["image_path"] for record in final.values()}
+    for image_path in replaced_images - kept:
+        remove_image(image_path)
+    
+    results = []
+    for index, kind, position in targets:
+        if kind == "error":
+            results.append(BatchItemResult(index=index, status="error", error=position))
+        elif kind == "hit":
+            record = updated[position]
+            if record is None:
+                results.append(BatchItemResult(index=index, status="created", id=recreated[position]["id"]))
+            else:
+                results.append(BatchItemResult(index=index, status="merged", id=record["id"]))
+        else:
+            results.append(BatchItemResult(index=index, status=kind, id=created[position]["id"]))
+    
+    for record in created:
+        if record["confidence"]:
+            queue_email_alert(record)
+    
+    summary = BatchResult(
+        created=sum(1 for r in results if r.status == "created"),
+        merged=sum(1 for r in results if r.status == "merged"),
+        failed=sum(1 for r in results if r.status == "error"),
+        results=results,
+    )
+    detection_stats.record_potholes(created=summary.created, merged=summary.merged)
+    log.info("✅ Batch stored: %d new, %d merged, %d failed", summary.created, summary.merged, summary.failed)
+    return summary
+
+def parse_batch_item(data) -> Union[PotholeCreate, str]:
+    """Validate one uploaded item; returns an error message instead of raising"""
+    if not isinstance(data, dict):
+        return "Expected a JSON object"
+    try:
+        return PotholeCreate(**data)
+    except ValidationError as e:
+        return "; ".join(
+            f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
         )
-        
+
+@app.post("/potholes/batch", response_model=BatchResult)
+async def create_potholes_batch(request: Request):
+    """
+    Create many potholes in one request (detections buffered while offline)
+    
+    Body is a JSON array of PotholeCreate objects, or NDJSON - one object
+    per line - with Content-Type application/x-ndjson (parsed as it
+    streams in). All rows are written in one transaction; every item gets
+    its own result, so a bad row does not fail the rest of the batch.
+    """
+    items = []
+    
+    def add(item):
+        if len(items) >= BATCH_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail=f"Batch is limited to {BATCH_MAX_ITEMS} items")
+        items.append(item)
+    
+    def add_line(line: bytes):
+        if not line.strip():
+            return
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            add(f"Invalid JSON: {e}")
+            return
+        add(parse_batch_item(data))
+    
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                add_line(line)
+        add_line(buffer)
+    else:
+        try:
+            data = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(data, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array")
+        for entry in data:
+            add(parse_batch_item(entry))
+    
+    try:
+        return await run_in_threadpool(save_batch, items)
     except Exception as e:
-        print(f"❌ Error saving pothole: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to save pothole: {str(e)}")
+        log.error("❌ Error saving batch: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to save batch: {str(e)}")
 
 @app.get("/potholes", response_model=List[Pothole])
-def get_potholes():
+def get_potholes(
+    request: Request,
+    response: Response,
+    bbox: Optional[str] = Query(None, description="minLon,minLat,maxLon,maxLat"),
+    near: Optional[str] = Query(None, description="lat,lon"),
+    radius_m: float = Query(500.0, gt=0, description="Search radius for ?near= in metres"),
+    sort: Optional[str] = Query(None, description="id, timestamp or confidence (default: id; distance for ?near=)"),
+    order: str = Query("asc", description="asc or desc"),
+    after_id: Optional[int] = Query(None, description="Return the page after this pothole (X-Next-After-Id)"),
+    limit: Optional[int] = Query(None, ge=1, le=10000, description="Page size (default: everything)"),
+    min_confidence: Optional[float] = Query(None, ge=0, le=1),
+    max_confidence: Optional[float] = Query(None, ge=0, le=1),
+    since: Optional[str] = Query(None, description="Only potholes reported at/after this ISO timestamp"),
+    until: Optional[str] = Query(None, description="Only potholes reported at/before this ISO timestamp"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (default: all)")
+):
     """
-    Get all stored potholes
+    Get stored potholes, optionally limited to an area
     
+    Args:
+        bbox: Only potholes inside this bounding box
+        near: Only potholes within radius_m of this point (nearest first)
+        radius_m: Radius for near, in metres
+        sort/order: Sort field and direction (ties are broken by id)
+        after_id/limit: Keyset pagination - pass the X-Next-After-Id header
+            of a page as after_id to get the next one
+        min_confidence/max_confidence, since/until: Filters
+        fields: Projection - only these fields are serialized
+        
     Returns:
-        List of all pothole entries
+        List of pothole entries (304 if If-None-Match matches the ETag)
     """
+    # Conditional GET: an unchanged dataset costs one change-log lookup
+    seq = store.current_seq()
+    etag = make_etag(seq, request)
+    headers = {"ETag": etag, "X-Change-Seq": str(seq), "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    if bbox is not None and near is not None:
+        raise HTTPException(status_code=400, detail="Use either bbox or near, not both")
+    if sort is not None and sort not in SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(SORT_FIELDS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
     try:
-        # Initialize CSV if needed
-        initialize_csv()
+        selected = parse_fields(fields) if fields else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if near is None and sort is None:
+        sort = "id"
+    
+    if (record_cache is not None and bbox is None and near is None and since is None and until is None
+            and sort in CACHE_SORTS):
+        # Served from the record cache: no store query, no Pothole models
+        record_cache.refresh(seq)
+        try:
+            body, last_id = record_cache.select(
+                sort, descending=order == "desc", after_id=after_id, limit=limit,
+                min_confidence=min_confidence, max_confidence=max_confidence, fields=selected
+            )
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"after_id {after_id} no longer exists")
+        if last_id is not None:
+            headers["X-Next-After-Id"] = str(last_id)
+        return Response(body, media_type="application/json", headers=headers)
+    
+    try:
+        # Keyset cursor: (sort value, id) of the after_id pothole
+        after = None
+        if after_id is not None:
+            if sort in (None, "id"):
+                after = (after_id, after_id)
+            else:
+                anchor = store.get(after_id)
+                if anchor is None:
+                    raise HTTPException(status_code=400, detail=f"after_id {after_id} no longer exists")
+                after = (sort_key(anchor, sort), after_id)
+        options = dict(
+            descending=order == "desc", after=after, limit=limit,
+            min_confidence=min_confidence, max_confidence=max_confidence, since=since, until=until
+        )
         
-        potholes = []
+        if bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = parse_floats(bbox, 4, "bbox")
+            if min_lon > max_lon or min_lat > max_lat:
+                raise HTTPException(status_code=400, detail="bbox must be minLon,minLat,maxLon,maxLat")
+            ids = ensure_spatial_index().query_bbox(min_lon, min_lat, max_lon, max_lat)
+            records = select_records(store.get_many(ids), sort, **options)
+        elif near is not None:
+            lat, lon = parse_floats(near, 2, "near")
+            hits = ensure_spatial_index().query_radius(lat, lon, radius_m)
+            by_id = {record["id"]: record for record in store.get_many([pid for pid, _ in hits])}
+            records = select_records((by_id[pid] for pid, _ in hits if pid in by_id), sort, **options)
+        else:
+            records = store.query(sort, **options)
         
-        # Read from CSV
-        with open(CSV_FILE, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                potholes.append(Pothole(
-                    id=int(row['id']),
-                    latitude=float(row['latitude']),
-                    longitude=float(row['longitude']),
-                    timestamp=row['timestamp'],
-                    confidence=float(row['confidence']) if row.get('confidence') and row['confidence'] else None,
-                    image_path=row.get('image_path') if row.get('image_path') else None
-                ))
+        if limit is not None and len(records) == limit:
+            headers["X-Next-After-Id"] = str(records[-1]["id"])
         
-        print(f"✅ Retrieved {len(potholes)} potholes")
-        return potholes
+        log.debug("✅ Retrieved %d potholes", len(records))
+        if selected is not None:
+            # Projection: plain dicts, no Pothole models for unused fields
+            return JSONResponse([{field: record[field] for field in selected} for record in records],
+                                headers=headers)
+        response.headers.update(headers)
+        return [Pothole(**record) for record in records]
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Error retrieving potholes: {e}")
+        log.error("❌ Error retrieving potholes: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to retrieve potholes: {str(e)}")
 
+@app.get("/potholes/export")
+def export_potholes(
+    format: str = Query("ndjson", description="ndjson, csv or geojson"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to include (default: all)"),
+    gzip: bool = Query(False, description="Download as a .gz file")
+):
+    """
+    Stream every pothole without building the list in memory
+    
+    Rows come straight from a store generator, so memory use is constant
+    and the first bytes go out immediately. X-Change-Seq is the dataset
+    version at the start of the export; continue with
+    GET /potholes/changes?since= to pick up later changes.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    try:
+        selected = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"potholes.{extension}"
+    seq = store.current_seq()
+    chunks = export_chunks(store.iter_all(), format, selected)
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        media_type = "application/gzip"
+        filename += ".gz"
+    
+    log.info("📤 Exporting potholes as %s", filename)
+    return StreamingResponse(chunks, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "X-Change-Seq": str(seq),
+    })
+
+# Summaries per (seq, since), so every open dashboard costs one aggregate query per change
+summary_cache = {}
+summary_lock = threading.Lock()
+
+@app.get("/potholes/summary", response_model=PotholeSummary)
+def get_pothole_summary(
+    request: Request,
+    since: Optional[str] = Query(None, description="Also count potholes reported at/after this ISO timestamp")
+):
+    """
+    Get dataset aggregates without fetching every pothole
+    
+    Returns:
+        PotholeSummary (304 if If-None-Match matches the ETag)
+    """
+    seq = store.current_seq()
+    etag = make_etag(seq, request)
+    headers = {"ETag": etag, "X-Change-Seq": str(seq), "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    with summary_lock:
+        summary = summary_cache.get((seq, since))
+    if summary is None:
+        try:
+            totals = store.summary(since)
+        except Exception as e:
+            log.error("❌ Error computing summary: %s", e)
+            raise HTTPException(status_code=500, detail=f"Failed to compute summary: {str(e)}")
+        summary = PotholeSummary(
+            seq=seq,
+            count=totals["count"],
+            avg_confidence=totals["confidence_sum"] / totals["count"] if totals["count"] else 0.0,
+            since_count=totals["since_count"],
+        )
+        with summary_lock:
+            if any(key[0] != seq for key in summary_cache):
+                summary_cache.clear()
+            summary_cache[(seq, since)] = summary
+    return JSONResponse(summary.model_dump(), headers=headers)
+
+@app.get("/potholes/changes", response_model=ChangesResponse)
+def get_pothole_changes(
+    since: int = Query(0, ge=0, description="Last seq the client has seen (X-Change-Seq)"),
+    limit: int = Query(1000, ge=1, le=10000)
+):
+    """
+    Get inserts and deletes since a change sequence number
+    
+    Args:
+        since: Sequence number from X-Change-Seq or a previous call
+        limit: Maximum number of changes to return
+        
+    Returns:
+        ChangesResponse (reset=True means reload the full list)
+    """
+    try:
+        changes, reset = store.changes(since, limit + 1)
+    except Exception as e:
+        log.error("❌ Error retrieving changes: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve changes: {str(e)}")
+    
+    if reset:
+        return ChangesResponse(seq=store.current_seq(), reset=True, has_more=False, changes=[])
+    
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    return ChangesResponse(
+        seq=changes[-1]["seq"] if changes else since,
+        reset=False,
+        has_more=has_more,
+        changes=changes
+    )
+
+# Client reconnect delay sent to EventSource
+EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", "2000"))
+
+def sse_event(event: str, seq: int, data: dict) -> str:
+    return f"id: {seq}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+@app.get("/potholes/events")
+async def get_pothole_events(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="Last seq the client has seen (X-Change-Seq)")
+):
+    """
+    Live inserts, updates and deletes as Server-Sent Events
+    
+    Each change is sent as "event: change" with the change seq as its id
+    and a PotholeChange as data. "event: reset" (data {"seq"}) means the
+    client's position is no longer in the change log: reload the list.
+    
+    Args:
+        since: Start after this seq (default: now). A reconnecting
+            EventSource sends Last-Event-ID instead, which takes precedence.
+    """
+    last_event_id = request.headers.get("last-event-id", "")
+    position = int(last_event_id) if last_event_id.isdigit() else since
+    subscriber = await broadcaster.subscribe()
+    if position is None:
+        position = broadcaster.seq
+    
+    async def catch_up():
+        """Events from the change log after `position` (replay / lagged subscriber)"""
+        nonlocal position
+        while True:
+            changes, reset = await run_in_threadpool(store.changes, position, EVENTS_READ_LIMIT)
+            if reset:
+                position = await run_in_threadpool(store.current_seq)
+                yield sse_event("reset", position, {"seq": position})
+                return
+            for change in changes:
+                position = change["seq"]
+                yield sse_event("change", position, change)
+            if len(changes) < EVENTS_READ_LIMIT:
+                return
+    
+    async def stream():
+        nonlocal position
+        try:
+            yield f"retry: {EVENTS_RETRY_MS}\n\n"
+            async for event in catch_up():
+                yield event
+            while True:
+                if subscriber.lagged:
+                    # Fell more than a buffer behind: drop it and read the log instead
+                    subscriber.lagged = False
+                    while not subscriber.queue.empty():
+                        subscriber.queue.get_nowait()
+                    async for event in catch_up():
+                        yield event
+                    continue
+                try:
+                    change = await asyncio.wait_for(subscriber.queue.get(), timeout=EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"  # Keeps proxies from closing an idle stream
+                    continue
+                if change.get("reset"):
+                    position = change["seq"]
+                    yield sse_event("reset", position, {"seq": position})
+                elif change["seq"] > position:
+                    position = change["seq"]
+                    yield sse_event("change", position, change)
+        finally:
+            broadcaster.unsubscribe(subscriber)
+    
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/potholes/tiles/{z}/{x}/{y}")
+def get_pothole_tile(z: int, x: int, y: int):
+    """
+    Get clustered potholes for one map tile (Web Mercator z/x/y)
+    
+    Args:
+        z, x, y: Slippy-map tile coordinates
+        
+    Returns:
+        Tile with clusters (centroid, count, mean/max confidence)
+    """
+    if not 0 <= z <= MAX_ZOOM or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+        raise HTTPException(status_code=400, detail=f"Invalid tile {z}/{x}/{y}")
+    
+    # Catch up with other workers' writes first: that invalidates their tiles
+    index = ensure_spatial_index()
+    key = (z, x, y)
+    tile = tile_cache.get(key)
+    if tile is None:
+        generation = tile_cache.generation
+        points = index.points_in_bbox(*tile_bounds(z, x, y))
+        tile = build_tile(points, z, x, y)
+        tile_cache.put(key, tile, generation)
+    return tile
+
+@app.get("/potholes/{pothole_id}", response_model=Pothole)
+def get_pothole(pothole_id: int):
+    """
+    Get a single pothole by ID
+    
+    Args:
+        pothole_id: ID of the pothole
+        
+    Returns:
+        Pothole object
+    """
+    try:
+        record = store.get(pothole_id)
+    except Exception as e:
+        log.error("❌ Error retrieving pothole: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve pothole: {str(e)}")
+    
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Pothole #{pothole_id} not found")
+    return Pothole(**record)
+
 @app.delete("/potholes/{pothole_id}")
 def delete_pothole(pothole_id: int):
     """
@@ -289,61 +1001,136 @@ def delete_pothole(pothole_id: int):
         Success message
     """
     try:
-        initialize_csv()
-        
-        # Read all potholes
-        potholes = []
-        pothole_to_delete = None
-        
-        with open(CSV_FILE, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if int(row['id']) == pothole_id:
-                    pothole_to_delete = row
-                else:
-                    potholes.append(row)
+        pothole_to_delete = store.delete(pothole_id)
         
         if not pothole_to_delete:
             raise HTTPException(status_code=404, detail=f"Pothole #{pothole_id} not found")
         
-        # Write back without the deleted pothole
-        with open(CSV_FILE, 'w', newline='') as f:
-            fieldnames = ['id', 'latitude', 'longitude', 'timestamp', 'confidence', 'image_path']
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(potholes)
+        # Caught up with the change log, so its size is the row count (no COUNT(*) scan)
+        remaining = len(ensure_spatial_index())
+        broadcaster.notify()
         
         # Optionally delete the image file
-        if pothole_to_delete.get('image_path'):
-            image_path = pothole_to_delete['image_path']
-            if os.path.exists(image_path):
-                try:
-                    os.remove(image_path)
-                    print(f"🗑️ Deleted image: {image_path}")
-                except Exception as img_err:
-                    print(f"⚠️ Could not delete image: {img_err}")
+        remove_image(pothole_to_delete.get('image_path'))
         
-        print(f"✅ Pothole #{pothole_id} deleted successfully")
+        log.info("✅ Pothole #%d deleted successfully", pothole_id)
         return {
             "message": f"Pothole #{pothole_id} deleted successfully",
             "deleted_id": pothole_id,
-            "remaining_count": len(potholes)
+            "remaining_count": remaining
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error deleting pothole: {e}")
+        log.error("❌ Error deleting pothole: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to delete pothole: {str(e)}")
 
+@app.get("/detected_potholes/{name:path}")
+def get_detection_image(
+    name: str,
+    request: Request,
+    size: Optional[str] = Query(None, description="thumb or medium (default: original)")
+):
+    """
+    Serve a detection image, or a cached downscaled copy of it
+    
+    ?size=thumb|medium returns a derivative (rendered on first request,
+    WebP when the Accept header allows it). All variants are sent with a
+    long-lived Cache-Control header.
+    """
+    root = os.path.realpath(IMAGES_DIR)
+    path = os.path.realpath(os.path.join(root, name))
+    if not path.startswith(root + os.sep):
+        raise HTTPException(status_code=404, detail="Image not found")
+    if not os.path.isfile(path):
+        # A fresh detection may still be in the background writer's queue
+        if not image_writer.wait(os.path.join(IMAGES_DIR, name), timeout=IMAGE_WAIT_SECONDS):
+            raise HTTPException(status_code=404, detail="Image not found")
+    
+    # Content-addressed names (ab/cd/<hash>.jpg) never change
+    immutable = ", immutable" if os.path.dirname(name) else ""
+    headers = {"Cache-Control": f"public, max-age={IMAGE_CACHE_SECONDS}{immutable}"}
+    if size is None:
+        return FileResponse(path, headers=headers)
+    if size not in IMAGE_SIZES:
+        raise HTTPException(status_code=400, detail=f"size must be one of: {', '.join(IMAGE_SIZES)}")
+    
+    fmt = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+    try:
+        derived = get_derived(root, os.path.relpath(path, root), size, fmt)
+    except Exception as e:
+        log.error("❌ Could not create %s image for %s: %s", size, name, e)
+        raise HTTPException(status_code=500, detail="Could not create image")
+    headers["Vary"] = "Accept"
+    return FileResponse(derived, media_type=DERIVED_FORMATS[fmt][2], headers=headers)
+
+def record_detection(result: dict):
+    """Stage timings, frame cache outcome and detection counters for one frame"""
+    timings = result.get("timings", {})
+    for stage, seconds in timings.items():
+        DETECT_STAGE_SECONDS.observe(seconds, stage=stage)
+    if "hash" in timings:
+        FRAME_CACHE_REQUESTS.inc(result="hit" if result.get("cached") else "miss")
+    if result.get("confirmed"):
+        TRACKS_CONFIRMED.inc()
+    if result.get("cached"):
+        # A repeat of an already counted frame, not a new detection
+        detection_stats.record_cached_frame()
+    else:
+        detection_stats.record_frame(result["detected"], result["confidence"], result.get("inference_ms"))
+
+def detection_result(result: dict) -> DetectionResult:
+    """API response for a detect_pothole() result"""
+    if result["detected"]:
+        if result.get("tracking") and not result.get("confirmed"):
+            message = f"Pothole candidate seen in {result.get('track_frames', 0)} recent frame(s)."
+        else:
+            message = f"Pothole detected with {result['confidence']:.1%} confidence!"
+        return DetectionResult(
+            detected=True,
+            confidence=result["confidence"],
+            bbox=result["bbox"],
+            image_filename=result["image_filename"],
+            image_path=result["image_path"],  # Full path with directory
+            cached=result.get("cached", False),
+            tracking=result.get("tracking", False),
+            confirmed=result.get("confirmed", False),
+            message=message
+        )
+    return DetectionResult(
+        detected=False,
+        confidence=0.0,
+        bbox=None,
+        image_filename=None,
+        image_path=None,
+        cached=result.get("cached", False),
+        tracking=result.get("tracking", False),
+        message="No pothole detected in image."
+    )
+
+async def run_detection(image_bytes: bytes, client_id: Optional[str]) -> dict:
+    """detect_pothole() on the inference pool; raises InferenceQueueFull when saturated"""
+    # Adaptive resolution reacts to this process's queue, so decide here
+    imgsz = ml_detector.inference_settings.select(inference_pool.queue_depth())
+    # Keyed so a client's frames reach the worker process holding its frame cache and tracks
+    result = await inference_pool.run(detect_pothole, image_bytes, client_id, imgsz, key=client_id)
+    record_detection(result)
+    return result
+
 @app.post("/detect", response_model=DetectionResult)
-async def detect_pothole_endpoint(file: UploadFile = File(...)):
+async def detect_pothole_endpoint(request: Request, file: UploadFile = File(...)):
     """
     Detect pothole in uploaded image using YOLO ML model.
     
     Args:
         file: Uploaded image file
         
+    The X-Client-Id header keys the near-duplicate frame cache and the
+    multi-frame tracker, so a camera that keeps sending the same view gets
+    the previous result without another model pass. Without it both are
+    skipped: behind a proxy the client address is shared by everyone.
+        
     Returns:
         DetectionResult with detection status, confidence, and image path
     """
@@ -351,36 +1138,138 @@ async def detect_pothole_endpoint(file: UploadFile = File(...)):
         # Read image bytes
         image_bytes = await file.read()
         
-        # Run ML detection
-        result = detect_pothole(image_bytes)
-        
-        if result["detected"]:
-            return DetectionResult(
-                detected=True,
-                confidence=result["confidence"],
-                bbox=result["bbox"],
-                image_filename=result["image_filename"],
-                image_path=result["image_path"],  # Full path with directory
-                message=f"Pothole detected with {result['confidence']:.1%} confidence!"
-            )
-        else:
-            return DetectionResult(
-                detected=False,
-                confidence=0.0,
-                bbox=None,
-                image_filename=None,
-                image_path=None,
-                message="No pothole detected in image."
-            )
+        # Run ML detection on the inference pool (keeps the event loop free)
+        client_id = request.headers.get("x-client-id")
+        result = await run_detection(image_bytes, client_id)
+        return detection_result(result)
             
+    except InferenceQueueFull as e:
+        log.warning("⚠️ Detection rejected: %s", e)
+        raise HTTPException(
+            status_code=503,
+            detail="Detection queue is full, retry shortly",
+            headers={"Retry-After": str(INFERENCE_RETRY_AFTER)}
+        )
     except Exception as e:
-        print(f"❌ Error in detection endpoint: {e}")
+        detection_stats.record_error()
+        log.error("❌ Error in detection endpoint: %s", e)
         raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
 
+# Open /detect/stream connections (for /metrics)
+open_streams = 0
+
+@app.websocket("/detect/stream")
+async def detect_stream(websocket: WebSocket):
+    """
+    Continuous detection over one WebSocket connection.
+    
+    The client sends binary JPEG frames and gets one JSON message per
+    processed frame: the DetectionResult fields plus "frame" (1-based
+    number of the frame on this connection) and "dropped" (frames
+    skipped so far). Failures are reported as {"frame", "error"}, with
+    "retry_after" when the inference queue is full.
+    
+    Only the newest unprocessed frame is kept. A frame that arrives while
+    another is still waiting replaces it, so when inference falls behind
+    the client gets results for fresh frames instead of a growing backlog.
+    
+    Query: client_id keys the near-duplicate frame cache and the tracker
+    (as X-Client-Id does for POST /detect); without it they are keyed by
+    this connection.
+    """
+    global open_streams
+    await websocket.accept()
+    client_id = (websocket.query_params.get("client_id") or websocket.headers.get("x-client-id")
+                 or f"stream-{uuid.uuid4().hex}")
+    pending = None  # (frame number, bytes) waiting for inference
+    frame_ready = asyncio.Event()
+    dropped = 0
+
+    async def receive_frames():
+        nonlocal pending, dropped
+        number = 0
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            data = message.get("bytes")
+            if data is None:
+                continue  # Text messages (keep-alives) carry no frame
+            number += 1
+            if pending is not None:
+                dropped += 1
+                STREAM_FRAMES.inc(result="dropped")
+            pending = (number, data)
+            frame_ready.set()
+
+    open_streams += 1
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            waiter = asyncio.create_task(frame_ready.wait())
+            done, _ = await asyncio.wait({receiver, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                waiter.cancel()
+                break
+            frame_ready.clear()
+            number, image_bytes = pending
+            pending = None
+            try:
+                result = await run_detection(image_bytes, client_id)
+            except InferenceQueueFull as e:
+                log.warning("⚠️ Stream frame rejected: %s", e)
+                STREAM_FRAMES.inc(result="rejected")
+                await websocket.send_json({"frame": number, "error": "Detection queue is full",
+                                           "retry_after": INFERENCE_RETRY_AFTER})
+                continue
+            except Exception as e:
+                detection_stats.record_error()
+                STREAM_FRAMES.inc(result="error")
+                log.error("❌ Error in detection stream: %s", e)
+                await websocket.send_json({"frame": number, "error": str(e)})
+                continue
+            STREAM_FRAMES.inc(result="processed")
+            if receiver.done():
+                break  # Client went away during inference
+            await websocket.send_json({**detection_result(result).model_dump(), "frame": number, "dropped": dropped})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        open_streams -= 1
+        receiver.cancel()
+
 @app.get("/detection-stats")
 def get_stats():
-    """Get statistics about ML detections."""
-    return get_detection_stats()
+    """Get statistics about ML detections (maintained counters, no disk scan)."""
+    return {**detection_stats.snapshot(), **get_detection_stats()}
+
+# Queue depths and model state, read at scrape time
+Gauge("pothole_inference_running", "Inference jobs running", lambda: inference_pool.stats()["running"])
+Gauge("pothole_inference_queued", "Inference jobs waiting for a worker", lambda: inference_pool.stats()["queued"])
+Gauge("pothole_inference_rejected", "Detections rejected with 503 since start", lambda: inference_pool.rejected)
+Gauge("pothole_batcher_queued", "Frames waiting for a micro-batch",
+      lambda: batcher.queue_depth() if batcher is not None else None)
+Gauge("pothole_image_writer_pending", "Detection images waiting to be written",
+      lambda: image_writer.stats()["pending"])
+Gauge("pothole_email_queued", "Email alerts waiting to be sent",
+      lambda: notification_dispatcher.stats()["queued"] if notification_dispatcher else None)
+Gauge("pothole_event_subscribers", "Open /potholes/events streams", lambda: broadcaster.stats()["subscribers"])
+Gauge("pothole_detect_streams", "Open /detect/stream connections", lambda: open_streams)
+Gauge("pothole_inference_imgsz", "YOLO input size for the next frame", ml_detector.inference_settings.current)
+Gauge("pothole_model_load_seconds", "Time taken to load the YOLO model", lambda: ml_detector.model_load_seconds)
+Gauge("pothole_cached_potholes", "Potholes in the in-memory record cache",
+      lambda: len(record_cache) if record_cache is not None else None)
+Gauge("pothole_indexed_potholes", "Potholes in the in-memory spatial index", lambda: len(spatial_index))
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus metrics: stage/storage/email/request histograms and queue depths."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/inference/status")
+def get_inference_status():
+    """Get inference pool load (running/queued jobs)."""
+    return inference_pool.stats()
 
 
 # ============================================
@@ -389,16 +1278,45 @@ def get_stats():
 
 @app.on_event("startup")
 def startup_event():
-    """Initialize CSV file on server startup"""
-    initialize_csv()
+    """Initialize storage on server startup"""
+    store.initialize()
+    ensure_spatial_index()
     
     # Create detected_potholes directory if it doesn't exist
     os.makedirs(IMAGES_DIR, exist_ok=True)
+    # Counters start from the images already on disk the first time
+    detection_stats.load(seed=count_saved_images)
+    
+    # Load and warm up the model now instead of on the first /detect
+    if os.getenv("WARMUP_MODEL", "1") == "1":
+        if inference_pool.kind == "process":
+            # Inference runs in the worker processes, each with its own model
+            inference_pool.start(initializer=warmup_worker)
+        else:
+            try:
+                warmup_model()
+            except Exception as e:
+                log.warning("⚠️ Model warm-up failed (will retry lazily): %s", e)
     
     print("🚀 Pothole Detection API started successfully!")
     print(f"📁 Data directory: {DATA_DIR}")
-    print(f"📄 CSV file: {CSV_FILE}")
+    print(f"📄 Storage: {store.describe()}")
     print(f"🖼️  Images directory: {IMAGES_DIR}")
     print(f"💾 Persistent storage: {'ENABLED ✅' if DATA_DIR != '.' else 'DISABLED (local dev)'}")
     print(f"🌐 API available at: http://localhost:8000")
     print(f"📚 API docs at: http://localhost:8000/docs")
+    print(f"🧠 Inference pool: {inference_pool.workers} {inference_pool.kind} worker(s), queue {inference_pool.queue_size}")
+    if batcher is not None:
+        print(f"📦 Micro-batching: up to {batcher.max_size} frames / {batcher.max_wait * 1000:.0f} ms")
+        if inference_pool.workers < batcher.max_size:
+            print("⚠️ INFERENCE_WORKERS < BATCH_MAX_SIZE: batches can never fill up")
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Stop background workers"""
+    inference_pool.shutdown()
+    image_writer.shutdown()  # Flush detection images still queued
+    detection_stats.flush()
+    if notification_dispatcher:
+        notification_dispatcher.stop()
@@ -0,0 +1,224 @@
+"""
+Metrics
+=======
+
+Minimal Prometheus text-format metrics (no client library needed),
+served by GET /metrics:
+- Histogram - cumulative buckets + sum + count, optional labels
+- Counter   - monotonically increasing total, optional labels
+- Gauge     - value read from a callback at scrape time
+
+Observing is a dict lookup and a few additions under a lock, cheap
+enough for per-frame use on the /detect path.
+
+Usage:
+    with DETECT_STAGE_SECONDS.time(stage="decode"):
+        ...
+    DETECT_STAGE_SECONDS.observe(0.012, stage="inference")
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Seconds: 1 ms .. 10 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY: List["Metric"] = []
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        REGISTRY.append(self)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> [bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block, in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            cumulative += values[len(self.buckets)]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Metric):
+    """
+    Value computed at scrape time.
+
+    callback returns a number, None (series omitted), or for labelled
+    gauges a dict {label value tuple: number}.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, callback: Callable, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        try:
+            value = self.callback()
+        except Exception:
+            value = None
+        if value is None:
+            return []
+        lines = self.header()
+        if isinstance(value, dict):
+            for key, number in sorted(value.items()):
+                if number is not None:
+                    lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(number)}")
+        else:
+            lines.append(f"{self.name} {_format_value(value)}")
+        return lines
+
+
+def render_metrics() -> str:
+    """Every registered metric in Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ============================================
+# Shared Metrics
+# ============================================
+
+DETECT_STAGE_SECONDS = Histogram(
+    "pothole_detect_stage_seconds",
+    "Time spent in each /detect stage (decode, inference, annotate)",
+    labels=("stage",),
+)
+IMAGE_WRITE_SECONDS = Histogram(
+    "pothole_image_write_seconds",
+    "JPEG encode + write of a detection image (background writer)",
+)
+STORAGE_SECONDS = Histogram(
+    "pothole_storage_seconds",
+    "Pothole store operations (CSV/SQLite I/O)",
+    labels=("backend", "op"),
+)
+EMAIL_SEND_SECONDS = Histogram(
+    "pothole_email_send_seconds",
+    "SMTP send of one alert or digest",
+    labels=("result",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+FRAME_CACHE_REQUESTS = Counter(
+    "pothole_frame_cache_requests_total",
+    "/detect frames answered from the near-duplicate frame cache (hit) or by the model (miss)",
+    labels=("result",),
+)
+TRACKS_CONFIRMED = Counter(
+    "pothole_tracks_confirmed_total",
+    "Potholes confirmed by the multi-frame tracker (one per physical pothole)",
+)
+STREAM_FRAMES = Counter(
+    "pothole_stream_frames_total",
+    "/detect/stream frames by outcome (processed, dropped as stale, rejected, error)",
+    labels=("result",),
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "pothole_http_request_seconds",
+    "HTTP request latency by route",
+    labels=("method", "route", "status"),
+)
+
+
+def instrument(obj, methods: Sequence[str], histogram: Histogram, **labels):
+    """Wrap methods of obj so every call is observed as histogram{op=<method>}"""
+    for method_name in methods:
+        method = getattr(obj, method_name, None)
+        if method is None:
+            continue
+
+        def timed(*args, _method=method, _op=method_name, **kwargs):
+            with histogram.time(op=_op, **labels):
+                return _method(*args, **kwargs)
+
+        setattr(obj, method_name, timed)
@@ -4,6 +4,41 @@ PHASE 3: ML Detection Module
 
 YOLO-based pothole detection from images.
 Processes frames from IP webcam and detects potholes.
+
+Concurrent frames can be micro-batched: MicroBatcher collects up to
+BATCH_MAX_SIZE frames (or waits at most BATCH_MAX_WAIT_MS) and runs a
+single batched YOLO call, handing each caller its own result.
+
+INFERENCE_BACKEND selects how best.pt is executed:
+- pytorch   - Ultralytics + PyTorch (default)
+- onnx      - ONNX export run through onnxruntime
+- onnx-int8 - ONNX export with dynamically quantized INT8 weights
+- openvino  - OpenVINO IR export
+Exported models are cached next to best.pt and created on first load.
+
+Uploads are decoded with cv2.imdecode straight from the request buffer
+into a BGR uint8 array (the layout YOLO expects). Large JPEGs use
+IMREAD_REDUCED_* so a 12 MP phone photo is decoded at 1/2, 1/4 or 1/8
+scale instead of full size; boxes are scaled back to the original frame.
+
+Input size and region (see InferenceSettings):
+- INFERENCE_IMGSZ            - YOLO input size (multiple of 32)
+- INFERENCE_ROI              - left,top,right,bottom fractions of the frame
+  to run on, e.g. 0,0.4,1,1 for the road below the horizon; the crop is a
+  view of the decoded frame and boxes are mapped back to the full frame
+- INFERENCE_RESOLUTION=adaptive steps through INFERENCE_IMGSZ_LEVELS: down
+  while the inference queue backs up, back up once it is idle
+
+A stopped vehicle keeps uploading the same view. FrameCache keeps the last
+few results per client keyed by a 64-bit dHash of the decoded frame; a
+frame within FRAME_CACHE_MAX_DISTANCE bits of a recent one reuses that
+result without running the model.
+
+With TRACKING_CONFIRM_FRAMES=K set, PotholeTracker associates boxes across
+a client's consecutive frames (IoU or centroid distance) and confirms a
+pothole once it was seen in K of the last TRACKING_WINDOW_FRAMES frames.
+Only then is one image - the track's best frame - written, and the result
+is marked confirmed so the client stores one record per physical pothole.
 """
 
 from ultralytics import YOLO
@@ -11,8 +46,19 @@ import cv2
 import numpy as np
 from PIL import Image
 import io
+import logging
 import os
-from datetime import datetime
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Optional
+
+from image_store import image_writer
+from log import get_logger
+
+log = get_logger("detector")
 
 # Configuration
 # Use relative path that works on both local and Render
@@ -20,31 +66,719 @@ MODEL_PATH = os.path.join(os.path.dirname(__file__), "models", "best.pt")
 CONFIDENCE_THRESHOLD = 0.3  # 30% confidence minimum (more sensitive for testing)
 # Use persistent disk for images in production, local directory in development
 IMAGES_DIR = os.path.join(os.getenv("DATA_DIR", "."), "detected_potholes")
+# Micro-batching: 1 disables it. Needs INFERENCE_WORKERS >= BATCH_MAX_SIZE
+# so enough frames are in flight at once to fill a batch.
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "1"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "15"))
+# Inference backend: pytorch | onnx | onnx-int8 | openvino
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "pytorch").lower()
+EXPORT_IMGSZ = int(os.getenv("EXPORT_IMGSZ", "640"))
+# Inference input: fixed | adaptive resolution, optional region of interest
+INFERENCE_RESOLUTION = os.getenv("INFERENCE_RESOLUTION", "fixed").lower()
+INFERENCE_IMGSZ = int(os.getenv("INFERENCE_IMGSZ", str(EXPORT_IMGSZ)))
+INFERENCE_IMGSZ_LEVELS = os.getenv("INFERENCE_IMGSZ_LEVELS", "320,480,640")
+INFERENCE_ROI = os.getenv("INFERENCE_ROI", "0,0,1,1")
+INFERENCE_ADAPT_QUEUE = int(os.getenv("INFERENCE_ADAPT_QUEUE", "2"))  # queued jobs that mean "under load"
+INFERENCE_ADAPT_INTERVAL = float(os.getenv("INFERENCE_ADAPT_INTERVAL", "2"))  # seconds between steps
+# Near-duplicate frame cache: 0 entries disables it
+FRAME_CACHE_ENTRIES = int(os.getenv("FRAME_CACHE_ENTRIES", "4"))  # per client
+FRAME_CACHE_CLIENTS = int(os.getenv("FRAME_CACHE_CLIENTS", "256"))
+FRAME_CACHE_TTL_SECONDS = float(os.getenv("FRAME_CACHE_TTL_SECONDS", "10"))
+FRAME_CACHE_MAX_DISTANCE = int(os.getenv("FRAME_CACHE_MAX_DISTANCE", "6"))  # of 64 bits
+# Multi-frame confirmation: 0 disables tracking (every detection is reported)
+TRACKING_CONFIRM_FRAMES = int(os.getenv("TRACKING_CONFIRM_FRAMES", "0"))  # K
+TRACKING_WINDOW_FRAMES = int(os.getenv("TRACKING_WINDOW_FRAMES", "5"))  # N
+TRACKING_IOU = float(os.getenv("TRACKING_IOU", "0.3"))
+TRACKING_CENTROID_DISTANCE = float(os.getenv("TRACKING_CENTROID_DISTANCE", "1.0"))  # in box diagonals
+TRACKING_TTL_SECONDS = float(os.getenv("TRACKING_TTL_SECONDS", "10"))
+TRACKING_CLIENTS = int(os.getenv("TRACKING_CLIENTS", "64"))
+TRACKING_MAX_TRACKS = int(os.getenv("TRACKING_MAX_TRACKS", "4"))  # per client
+
+
+# ============================================
+# Inference Backends
+# ============================================
+
+class InferenceBackend:
+    """Turns best.pt into a loadable model artifact for one runtime"""
+
+    name = "base"
+
+    def __init__(self, model_path: str = MODEL_PATH):
+        self.model_path = model_path
+        self.base_path = os.path.splitext(model_path)[0]
+
+    def artifact_path(self) -> str:
+        """Path of the model file this backend runs"""
+        return self.model_path
+
+    def export(self) -> str:
+        """Create the artifact if it doesn't exist yet; returns its path"""
+        return self.artifact_path()
+
+    def load(self):
+        """Load a YOLO-compatible callable model"""
+        return YOLO(self.export(), task="detect")
+
+
+class PyTorchBackend(InferenceBackend):
+    """Ultralytics + PyTorch on best.pt"""
+
+    name = "pytorch"
+
+    def load(self):
+        return YOLO(self.model_path)
+
 
-# Model will be loaded lazily (on first use)
+class OnnxBackend(InferenceBackend):
+    """ONNX export of best.pt, executed by onnxruntime"""
+
+    name = "onnx"
+
+    def artifact_path(self):
+        return f"{self.base_path}.onnx"
+
+    def _export_onnx(self) -> str:
+        path = f"{self.base_path}.onnx"
+        if not os.path.exists(path):
+            print(f"🔄 Exporting {self.model_path} to ONNX...")
+            # dynamic=True keeps the batch axis free for micro-batching
+            exported = YOLO(self.model_path).export(format="onnx", imgsz=EXPORT_IMGSZ,
+                                                    dynamic=True, simplify=True)
+            if os.path.abspath(exported) not in (os.path.abspath(path), os.path.abspath(self.model_path)):
+                os.replace(exported, path)
+            print(f"✅ ONNX model written to: {path}")
+        return path
+
+    def export(self):
+        return self._export_onnx()
+
+
+class OnnxInt8Backend(OnnxBackend):
+    """ONNX export with dynamically quantized INT8 weights"""
+
+    name = "onnx-int8"
+
+    def artifact_path(self):
+        return f"{self.base_path}.int8.onnx"
+
+    def export(self):
+        path = self.artifact_path()
+        if not os.path.exists(path):
+            try:
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+            except ImportError:
+                raise RuntimeError("onnx-int8 backend needs onnxruntime (pip install onnxruntime)")
+            fp32_path = self._export_onnx()
+            print("🔄 Quantizing ONNX model to INT8...")
+            quantize_dynamic(fp32_path, path, weight_type=QuantType.QUInt8)
+            print(f"✅ INT8 model written to: {path}")
+        return path
+
+
+class OpenVINOBackend(InferenceBackend):
+    """OpenVINO IR export (directory) of best.pt"""
+
+    name = "openvino"
+
+    def artifact_path(self):
+        return f"{self.base_path}_openvino_model"
+
+    def export(self):
+        path = self.artifact_path()
+        if not os.path.exists(path):
+            print(f"🔄 Exporting {self.model_path} to OpenVINO...")
+            exported = YOLO(self.model_path).export(format="openvino", imgsz=EXPORT_IMGSZ, dynamic=True)
+            if os.path.abspath(exported) not in (os.path.abspath(path), os.path.abspath(self.model_path)):
+                os.replace(exported, path)
+            print(f"✅ OpenVINO model written to: {path}")
+        return path
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (PyTorchBackend, OnnxBackend, OnnxInt8Backend, OpenVINOBackend)
+}
+
+
+def get_backend(name: str = INFERENCE_BACKEND) -> InferenceBackend:
+    """Instantiate an inference backend by name"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown INFERENCE_BACKEND: {name} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
+
+
+# Model will be loaded lazily (on first use) or by warmup_model() at startup
 model = None
+model_lock = threading.Lock()
+model_load_seconds = None
 
 def load_model():
     """Load YOLO model (lazy loading)"""
-    global model
+    global model, model_load_seconds
     if model is None:
-        print("🔄 Loading YOLO model...")
-        model = YOLO(MODEL_PATH)
-        print(f"✅ YOLO model loaded from: {MODEL_PATH}")
-        print(f"📊 Model classes: {model.names}")
-        
-        # Create images directory if it doesn't exist
-        os.makedirs(IMAGES_DIR, exist_ok=True)
-        print(f"📁 Images will be saved to: {IMAGES_DIR}")
+        with model_lock:
+            if model is None:
+                backend = get_backend()
+                print(f"🔄 Loading YOLO model ({backend.name} backend)...")
+                started = time.perf_counter()
+                loaded = backend.load()
+                model_load_seconds = time.perf_counter() - started
+                print(f"✅ YOLO model loaded from: {backend.artifact_path()} in {model_load_seconds:.2f}s")
+                print(f"📊 Model classes: {loaded.names}")
+                
+                # Create images directory if it doesn't exist
+                os.makedirs(IMAGES_DIR, exist_ok=True)
+                print(f"📁 Images will be saved to: {IMAGES_DIR}")
+                model = loaded
     return model
 
 
-def detect_pothole(image_bytes: bytes) -> dict:
+def warmup_model(runs: int = 1):
+    """Load the model and run dummy frames so the first request is fast"""
+    current_model = load_model()
+    started = time.perf_counter()
+    # Every input size in use (dynamic-shape runtimes prepare each one on first sight)
+    for imgsz in inference_settings.sizes():
+        dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        for _ in range(runs):
+            current_model(dummy, conf=CONFIDENCE_THRESHOLD, imgsz=imgsz, verbose=False)
+    print(f"🔥 Model warmed up in {time.perf_counter() - started:.2f}s")
+
+
+def warmup_worker():
+    """Inference process initializer: warm this process's model (a raise would break the pool)"""
+    try:
+        warmup_model()
+    except Exception as e:
+        log.warning("⚠️ Model warm-up failed in worker %d (will retry lazily): %s", os.getpid(), e)
+
+
+class MicroBatcher:
+    """
+    Collects frames from concurrent callers into one batched YOLO call.
+
+    submit() is called from inference worker threads; a single background
+    thread forms batches of up to max_size frames, waiting at most
+    max_wait_ms after the first frame arrives.
+    """
+
+    def __init__(self, max_size: int = BATCH_MAX_SIZE, max_wait_ms: float = BATCH_MAX_WAIT_MS):
+        self.max_size = max(1, max_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.frames = 0
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="yolo-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, image_np: np.ndarray, imgsz: int) -> Future:
+        """Queue a frame; the Future resolves to its YOLO Results object"""
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((image_np, imgsz, future))
+        return future
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # One YOLO call per input size (adaptive resolution may mix them)
+            groups = {}
+            for image, imgsz, future in batch:
+                groups.setdefault(imgsz, []).append((image, future))
+            for imgsz, group in groups.items():
+                try:
+                    current_model = load_model()
+                    results = current_model([image for image, _ in group], conf=CONFIDENCE_THRESHOLD,
+                                            imgsz=imgsz)
+                    self.batches += 1
+                    self.frames += len(group)
+                    for (_, future), result in zip(group, results):
+                        future.set_result(result)
+                except Exception as e:
+                    for _, future in group:
+                        if not future.done():
+                            future.set_exception(e)
+
+    def queue_depth(self) -> int:
+        """Frames waiting to be batched"""
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "frames": self.frames,
+            "mean_batch_size": self.frames / self.batches if self.batches else 0.0,
+        }
+
+
+batcher = MicroBatcher() if BATCH_MAX_SIZE > 1 else None
+
+
+def run_inference(image_np: np.ndarray, imgsz: int = INFERENCE_IMGSZ):
+    """Run YOLO on one frame (through the micro-batcher when enabled)"""
+    if batcher is not None:
+        return batcher.submit(image_np, imgsz).result()
+    return load_model()(image_np, conf=CONFIDENCE_THRESHOLD, imgsz=imgsz)[0]
+
+
+# ============================================
+# Input Size and Region of Interest
+# ============================================
+
+def parse_roi(text: str) -> tuple:
+    """'left,top,right,bottom' fractions of the frame -> tuple of floats"""
+    try:
+        left, top, right, bottom = (float(v) for v in text.split(","))
+    except ValueError:
+        raise ValueError(f"INFERENCE_ROI must be left,top,right,bottom fractions, got {text!r}")
+    if not (0 <= left < right <= 1 and 0 <= top < bottom <= 1):
+        raise ValueError(f"INFERENCE_ROI must satisfy 0 <= left < right <= 1 and 0 <= top < bottom <= 1, got {text!r}")
+    return left, top, right, bottom
+
+
+def crop_roi(image: np.ndarray, roi: tuple):
+    """
+    View of the region of interest (no copy).
+    
+    Returns:
+        (crop, offset_x, offset_y) with the crop's origin in image pixels
+    """
+    height, width = image.shape[:2]
+    left, top, right, bottom = roi
+    x1, y1 = int(left * width), int(top * height)
+    x2, y2 = max(x1 + 1, round(right * width)), max(y1 + 1, round(bottom * height))
+    return image[y1:y2, x1:x2], x1, y1
+
+
+class InferenceSettings:
+    """
+    YOLO input size and region of interest.
+    
+    In adaptive mode select() is called by the API process before each
+    frame with the current inference queue depth: the size steps down one
+    level while at least adapt_queue jobs are waiting and back up when the
+    queue is empty, at most once per adapt_interval seconds.
+    """
+
+    def __init__(self, mode: str = INFERENCE_RESOLUTION, imgsz: int = INFERENCE_IMGSZ,
+                 levels: str = INFERENCE_IMGSZ_LEVELS, roi: str = INFERENCE_ROI,
+                 adapt_queue: int = INFERENCE_ADAPT_QUEUE, adapt_interval: float = INFERENCE_ADAPT_INTERVAL):
+        if mode not in ("fixed", "adaptive"):
+            raise ValueError(f"Unknown INFERENCE_RESOLUTION: {mode} (expected fixed or adaptive)")
+        self.mode = mode
+        self.imgsz = imgsz
+        self.levels = sorted({int(v) for v in levels.split(",") if v.strip()})
+        if mode == "adaptive" and not self.levels:
+            raise ValueError("INFERENCE_IMGSZ_LEVELS needs at least one size")
+        self.roi = parse_roi(roi)
+        self.adapt_queue = max(1, adapt_queue)
+        self.adapt_interval = adapt_interval
+        self._lock = threading.Lock()
+        self._level = len(self.levels) - 1  # Start at full resolution
+        self._changed_at = 0.0
+        self.steps_down = 0
+        self.steps_up = 0
+
+    @property
+    def full_frame(self) -> bool:
+        return self.roi == (0.0, 0.0, 1.0, 1.0)
+
+    def sizes(self) -> list:
+        """Every input size this configuration can use"""
+        return self.levels if self.mode == "adaptive" else [self.imgsz]
+
+    def current(self) -> int:
+        return self.levels[self._level] if self.mode == "adaptive" else self.imgsz
+
+    def select(self, queued: int) -> int:
+        """Input size for the next frame given the number of queued inference jobs"""
+        if self.mode != "adaptive":
+            return self.imgsz
+        now = time.monotonic()
+        with self._lock:
+            if now - self._changed_at >= self.adapt_interval:
+                if queued >= self.adapt_queue and self._level > 0:
+                    self._level -= 1
+                    self.steps_down += 1
+                    self._changed_at = now
+                    log.info("⬇️ Inference queue at %d, input size now %d", queued, self.levels[self._level])
+                elif queued == 0 and self._level < len(self.levels) - 1:
+                    self._level += 1
+                    self.steps_up += 1
+                    self._changed_at = now
+                    log.info("⬆️ Inference queue idle, input size now %d", self.levels[self._level])
+            return self.levels[self._level]
+
+    def stats(self) -> dict:
+        return {
+            "resolution": self.mode,
+            "imgsz": self.current(),
+            "levels": self.levels if self.mode == "adaptive" else None,
+            "roi": list(self.roi),
+            "steps_down": self.steps_down,
+            "steps_up": self.steps_up,
+        }
+
+
+inference_settings = InferenceSettings()
+
+
+# ============================================
+# Image Decoding
+# ============================================
+
+REDUCED_FLAGS = {
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+}
+
+
+def probe_size(image_bytes: bytes):
+    """(width, height) from the image header only (no pixel decode)"""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            return image.size
+    except Exception:
+        return None
+
+
+def reduction_factor(width: int, height: int, target_size: int = EXPORT_IMGSZ) -> int:
+    """Largest power-of-two downscale that keeps the long side >= target_size"""
+    long_side = max(width, height)
+    for factor in (8, 4, 2):
+        if long_side / factor >= target_size:
+            return factor
+    return 1
+
+
+def decode_image(image_bytes: bytes, target_size: int = EXPORT_IMGSZ, roi: tuple = (0.0, 0.0, 1.0, 1.0)):
+    """
+    Decode an upload into a contiguous BGR uint8 array.
+    
+    The reduced-decode factor is chosen so the region of interest (not the
+    whole frame) keeps at least target_size pixels on its long side.
+    
+    Returns:
+        (image, scale_x, scale_y) where scale_* map decoded pixel
+        coordinates back to the original frame
+    """
+    buffer = np.frombuffer(image_bytes, dtype=np.uint8)  # view, no copy
+    size = probe_size(image_bytes)
+    if size:
+        left, top, right, bottom = roi
+        factor = reduction_factor(size[0] * (right - left), size[1] * (bottom - top), target_size)
+    else:
+        factor = 1
+    
+    # Keep pixel orientation as uploaded so boxes match the client's canvas
+    flags = REDUCED_FLAGS.get(factor, cv2.IMREAD_COLOR) | cv2.IMREAD_IGNORE_ORIENTATION
+    image = cv2.imdecode(buffer, flags)
+    if image is None:
+        raise ValueError("Could not decode image")
+    
+    if size is None:
+        return image, 1.0, 1.0
+    return image, size[0] / image.shape[1], size[1] / image.shape[0]
+
+
+# ============================================
+# Near-Duplicate Frame Cache
+# ============================================
+
+def frame_hash(image: np.ndarray) -> int:
+    """64-bit difference hash (dHash) of a BGR frame"""
+    gray = cv2.cvtColor(cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+    bits = (gray[:, 1:] > gray[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class FrameCache:
+    """
+    Recent detection results per client, looked up by perceptual hash.
+
+    Clients are evicted least-recently-used beyond max_clients; each keeps
+    its newest `entries` results, and results older than ttl seconds are
+    ignored. Lives in the process that runs detect_pothole().
+    """
+
+    def __init__(self, entries: int = FRAME_CACHE_ENTRIES, max_clients: int = FRAME_CACHE_CLIENTS,
+                 ttl: float = FRAME_CACHE_TTL_SECONDS, max_distance: int = FRAME_CACHE_MAX_DISTANCE):
+        self.entries = max(0, entries)
+        self.max_clients = max(1, max_clients)
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        # client -> [(hash, stored at, result), ...] newest last
+        self._clients: "OrderedDict[str, list]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.entries > 0
+
+    def get(self, client: str, frame: int) -> Optional[dict]:
+        """Closest unexpired result within max_distance bits, or None"""
+        now = time.monotonic()
+        with self._lock:
+            recent = self._clients.get(client)
+            best = None
+            if recent is not None:
+                self._clients.move_to_end(client)
+                recent[:] = [entry for entry in recent if now - entry[1] < self.ttl]
+                for cached_hash, _, result in recent:
+                    distance = (cached_hash ^ frame).bit_count()
+                    if distance <= self.max_distance and (best is None or distance < best[0]):
+                        best = (distance, result)
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return best[1]
+
+    def put(self, client: str, frame: int, result: dict):
+        with self._lock:
+            recent = self._clients.setdefault(client, [])
+            self._clients.move_to_end(client)
+            recent.append((frame, time.monotonic(), result))
+            del recent[:-self.entries]
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries_per_client": self.entries,
+            "clients": len(self._clients),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+frame_cache = FrameCache()
+
+
+# ============================================
+# Multi-Frame Tracking
+# ============================================
+
+def box_iou(a: list, b: list) -> float:
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    inter = width * height
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def centroid_distance(a: list, b: list) -> float:
+    """Distance between box centres in units of the larger box diagonal"""
+    dx = (a[0] + a[2] - b[0] - b[2]) / 2
+    dy = (a[1] + a[3] - b[1] - b[3]) / 2
+    diagonal = max(np.hypot(a[2] - a[0], a[3] - a[1]), np.hypot(b[2] - b[0], b[3] - b[1]), 1e-6)
+    return float(np.hypot(dx, dy) / diagonal)
+
+
+class Track:
+    """One candidate pothole followed across a client's frames"""
+
+    __slots__ = ("bbox", "window", "seen_at", "confirmed", "best_confidence", "best_image")
+
+    def __init__(self, bbox: list, window: int, now: float):
+        self.bbox = bbox
+        self.window = deque(maxlen=window)  # Seen (True) / missed per frame
+        self.seen_at = now
+        self.confirmed = False
+        self.best_confidence = 0.0
+        self.best_image = None  # Annotated frame, held until confirmation
+
+    @property
+    def hits(self) -> int:
+        return sum(self.window)
+
+
+class PotholeTracker:
+    """
+    Confirms potholes that persist across frames (K of the last N).
+    
+    Boxes are matched greedily to a client's tracks by IoU >= iou or a
+    centroid shift of at most centroid_distance box diagonals (a pothole
+    slides down the frame as the vehicle approaches). Each track keeps
+    the highest-confidence annotated frame; when it reaches `confirm`
+    hits that frame is written once and the track stays confirmed, so
+    later sightings of the same pothole are not reported again.
+    
+    Tracks expire after ttl seconds without a sighting; at most
+    max_tracks per client and max_clients clients (LRU) are kept, which
+    bounds the frames held in memory.
+    """
+
+    def __init__(self, confirm: int = TRACKING_CONFIRM_FRAMES, window: int = TRACKING_WINDOW_FRAMES,
+                 iou: float = TRACKING_IOU, centroid_distance: float = TRACKING_CENTROID_DISTANCE,
+                 ttl: float = TRACKING_TTL_SECONDS, max_clients: int = TRACKING_CLIENTS,
+                 max_tracks: int = TRACKING_MAX_TRACKS):
+        self.confirm = max(0, confirm)
+        self.window = max(self.confirm, window)
+        self.iou = iou
+        self.centroid_distance = centroid_distance
+        self.ttl = ttl
+        self.max_clients = max(1, max_clients)
+        self.max_tracks = max(1, max_tracks)
+        self._lock = threading.Lock()
+        self._clients: "OrderedDict[str, list]" = OrderedDict()
+        self.confirmed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.confirm > 0
+
+    def _associate(self, tracks: list, boxes: list) -> dict:
+        """{box index: track} for the best non-conflicting matches"""
+        candidates = []
+        for i, (bbox, _) in enumerate(boxes):
+            for track in tracks:
+                iou = box_iou(track.bbox, bbox)
+                distance = centroid_distance(track.bbox, bbox)
+                if iou >= self.iou or distance <= self.centroid_distance:
+                    candidates.append((-iou, distance, i, track))
+        matches, used = {}, set()
+        for _, _, i, track in sorted(candidates, key=lambda c: c[:3]):
+            if i not in matches and id(track) not in used:
+                matches[i] = track
+                used.add(id(track))
+        return matches
+
+    def update(self, client: str, boxes: list, image: Optional[np.ndarray]):
+        """
+        Add one frame's boxes [(bbox, confidence), ...].
+        
+        image is the annotated frame (None for a cached result).
+        
+        Returns:
+            (confirmed track or None, hits of the best-supported matched track)
+        """
+        now = time.monotonic()
+        with self._lock:
+            tracks = self._clients.setdefault(client, [])
+            self._clients.move_to_end(client)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+            tracks[:] = [track for track in tracks if now - track.seen_at < self.ttl]
+
+            matches = self._associate(tracks, boxes)
+            matched = set(id(track) for track in matches.values())
+            for track in tracks:
+                track.window.append(id(track) in matched)
+            for i, (bbox, confidence) in enumerate(boxes):
+                track = matches.get(i)
+                if track is None:
+                    track = Track(bbox, self.window, now)
+                    track.window.append(True)
+                    tracks.append(track)
+                    matches[i] = track
+                track.bbox = bbox
+                track.seen_at = now
+                if image is not None and (track.best_image is None or confidence > track.best_confidence):
+                    track.best_confidence = confidence
+                    track.best_image = image
+            # Drop tracks not seen within the window, then the oldest beyond the cap
+            tracks[:] = [track for track in tracks if track.hits > 0]
+            tracks.sort(key=lambda track: track.seen_at)
+            del tracks[:-self.max_tracks]
+
+            hits = max((track.hits for track in matches.values()), default=0)
+            ready = [track for track in matches.values()
+                     if not track.confirmed and track.hits >= self.confirm]
+            if not ready:
+                return None, hits
+            track = max(ready, key=lambda t: t.best_confidence)
+            track.confirmed = True
+            self.confirmed += 1
+            return track, track.hits
+
+    def stats(self) -> dict:
+        return {
+            "confirm_frames": self.confirm,
+            "window_frames": self.window,
+            "clients": len(self._clients),
+            "tracks": sum(len(tracks) for tracks in list(self._clients.values())),
+            "confirmed": self.confirmed,
+        }
+
+
+tracker = PotholeTracker()
+
+
+def apply_tracking(client_id: str, detection: dict, image: Optional[np.ndarray]) -> dict:
+    """
+    Per-frame detection -> tracked result.
+    
+    Unconfirmed frames report the raw detection without an image. The
+    frame that confirms a track reports that track's best frame: its
+    confidence and image (written now); bbox stays this frame's box.
+    """
+    track, hits = tracker.update(client_id, detection["boxes"], image)
+    result = {**detection, "image_path": None, "image_filename": None,
+              "tracking": True, "confirmed": track is not None, "track_frames": hits}
+    if track is not None:
+        result["confidence"] = track.best_confidence or detection["confidence"]
+        if track.best_image is not None:
+            image_path = image_writer.save(track.best_image)
+            result["image_path"] = image_path
+            result["image_filename"] = os.path.basename(image_path)
+            track.best_image = None
+        log.info("✅ Pothole confirmed in %d frames! Confidence: %.2f%%, Saved: %s",
+                 hits, result["confidence"] * 100, result["image_filename"])
+    return result
+
+
+def annotate(image: np.ndarray, boxes) -> np.ndarray:
+    """Draw detection boxes in place (the decoded frame is ours to reuse)"""
+    for box in boxes:
+        x1, y1, x2, y2 = (int(v) for v in box.xyxy[0].cpu().numpy().tolist())
+        label = f"pothole {float(box.conf[0]):.2f}"
+        thickness = max(2, round(sum(image.shape[:2]) / 600))
+        cv2.rectangle(image, (x1, y1), (x2, y2), (0, 0, 255), thickness)
+        cv2.putText(image, label, (x1, max(y1 - 6, 12)), cv2.FONT_HERSHEY_SIMPLEX,
+                    thickness / 3, (0, 0, 255), thickness)
+    return image
+
+
+def detect_pothole(image_bytes: bytes, client_id: Optional[str] = None,
+                   imgsz: Optional[int] = None) -> dict:
     """
     Detect pothole in image using YOLO model.
     
     Args:
         image_bytes: Image data as bytes
+        client_id: Uploader identity for the near-duplicate frame cache
+            and the multi-frame tracker (None skips both)
+        imgsz: YOLO input size (default: inference_settings.current())
         
     Returns:
         dict with detection results:
@@ -54,71 +788,103 @@ def detect_pothole(image_bytes: bytes) -> dict:
             "bbox": [x1, y1, x2, y2],
             "image_path": str (if saved)
         }
+        With tracking enabled also "tracking", "confirmed" and
+        "track_frames"; only confirmed results carry an image.
     """
+    # Stage timings in seconds, returned so the API process can record them
+    # (this function may run in an inference worker process)
+    timings = {}
     try:
-        # Load model if not already loaded
-        current_model = load_model()
-        
-        # Convert bytes to PIL Image
-        image = Image.open(io.BytesIO(image_bytes))
+        # Decode straight to a BGR array (reduced resolution for big JPEGs)
+        started = time.perf_counter()
+        imgsz = imgsz or inference_settings.current()
+        roi = inference_settings.roi
+        image_np, scale_x, scale_y = decode_image(image_bytes, imgsz, roi)
+        # Region of interest: a view, so annotations land on the full frame
+        region, offset_x, offset_y = crop_roi(image_np, roi)
+        timings["decode"] = time.perf_counter() - started
         
-        # Convert to RGB (remove alpha channel if present)
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-            print(f"🔄 Converted image from {image.mode} to RGB")
+        tracking = client_id is not None and tracker.enabled
         
-        # Convert PIL to numpy array for YOLO
-        image_np = np.array(image)
+        # Same view as one of this client's last frames: reuse its result
+        frame = None
+        if client_id is not None and frame_cache.enabled:
+            started = time.perf_counter()
+            frame = frame_hash(region)
+            cached = frame_cache.get(client_id, frame)
+            timings["hash"] = time.perf_counter() - started
+            if cached is not None:
+                log.debug("♻️ Near-duplicate frame from %s, reusing previous result", client_id)
+                if tracking:
+                    cached = apply_tracking(client_id, cached, None)
+                return {**cached, "inference_ms": None, "cached": True, "timings": timings}
         
         # Run YOLO detection
-        results = current_model(image_np, conf=CONFIDENCE_THRESHOLD)
+        started = time.perf_counter()
+        result = run_inference(region, imgsz)
+        timings["inference"] = time.perf_counter() - started
+        inference_ms = timings["inference"] * 1000
         
-        # Debug: Print all detections
-        print(f"🔍 Total detections: {len(results[0].boxes)}")
-        if len(results[0].boxes) > 0:
-            for i, box in enumerate(results[0].boxes):
-                conf = float(box.conf[0])
-                cls = int(box.cls[0])
-                print(f"   Detection {i+1}: Class={cls}, Confidence={conf:.2%}")
+        log.debug("🔍 Total detections: %d", len(result.boxes))
+        if log.enabled(logging.DEBUG):
+            for i, box in enumerate(result.boxes):
+                log.debug("   Detection %d: Class=%d, Confidence=%.2f%%",
+                          i + 1, int(box.cls[0]), float(box.conf[0]) * 100)
         
         # Check if any potholes detected
-        if len(results[0].boxes) > 0:
-            # Get first detection (highest confidence)
-            box = results[0].boxes[0]
-            confidence = float(box.conf[0])
-            bbox = box.xyxy[0].cpu().numpy().tolist()  # [x1, y1, x2, y2]
+        if len(result.boxes) > 0:
+            # Every box as ([x1, y1, x2, y2] in original-frame pixels, confidence)
+            boxes = []
+            for box in result.boxes:
+                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().tolist()
+                boxes.append(([(x1 + offset_x) * scale_x, (y1 + offset_y) * scale_y,
+                               (x2 + offset_x) * scale_x, (y2 + offset_y) * scale_y], float(box.conf[0])))
+            # Report the first detection (highest confidence)
+            bbox, confidence = boxes[0]
             
-            # Save image with detection
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            image_filename = f"pothole_{timestamp}_{confidence:.2f}.jpg"
-            image_path = os.path.join(IMAGES_DIR, image_filename)
+            # Draw bounding boxes on the decoded frame (no extra copy)
+            started = time.perf_counter()
+            annotate(region, result.boxes)
+            timings["annotate"] = time.perf_counter() - started
             
-            # Draw bounding box on image
-            annotated_image = results[0].plot()  # YOLO's built-in visualization
-            cv2.imwrite(image_path, annotated_image)
+            if tracking:
+                # Written by apply_tracking() once the pothole is confirmed
+                image_path = image_filename = None
+                log.debug("🔍 Pothole candidate, confidence %.2f%%", confidence * 100)
+            else:
+                # Save image with detection (content-addressed, written in the background)
+                image_path = image_writer.save(image_np)
+                image_filename = os.path.basename(image_path)
+                log.info("✅ Pothole detected! Confidence: %.2f%%, Saved: %s", confidence * 100, image_filename)
             
-            print(f"✅ Pothole detected! Confidence: {confidence:.2%}, Saved: {image_filename}")
-            
-            return {
+            detection = {
                 "detected": True,
                 "confidence": confidence,
                 "bbox": bbox,
+                "boxes": boxes,
                 "image_path": image_path,
-                "image_filename": image_filename
+                "image_filename": image_filename,
             }
         else:
             # No pothole detected
-            print(f"❌ No pothole detected (threshold: {CONFIDENCE_THRESHOLD:.0%})")
-            return {
+            log.debug("❌ No pothole detected (threshold: %.0f%%)", CONFIDENCE_THRESHOLD * 100)
+            detection = {
                 "detected": False,
                 "confidence": 0.0,
                 "bbox": None,
+                "boxes": [],
                 "image_path": None,
-                "image_filename": None
+                "image_filename": None,
             }
+        
+        if frame is not None:
+            frame_cache.put(client_id, frame, detection)
+        if tracking:
+            detection = apply_tracking(client_id, detection, image_np if detection["detected"] else None)
+        return {**detection, "inference_ms": inference_ms, "imgsz": imgsz, "cached": False, "timings": timings}
             
     except Exception as e:
-        print(f"❌ Error in detection: {e}")
+        log.error("❌ Error in detection: %s", e)
         raise Exception(f"Detection failed: {str(e)}")
 
 
@@ -128,14 +894,26 @@ def get_detection_stats() -> dict:
         # Create directory if it doesn't exist
         os.makedirs(IMAGES_DIR, exist_ok=True)
         
-        images = [f for f in os.listdir(IMAGES_DIR) if f.endswith('.jpg')]
         return {
-            "total_detections": len(images),
-            "images_directory": IMAGES_DIR
+            "images_directory": IMAGES_DIR,
+            "batching": batcher.stats() if batcher is not None else None,
+            "inference": inference_settings.stats(),
+            "frame_cache": frame_cache.stats() if frame_cache.enabled else None,
+            "tracking": tracker.stats() if tracker.enabled else None,
+            "image_writer": image_writer.stats()
         }
     except Exception as e:
         return {
-            "total_detections": 0,
             "images_directory": IMAGES_DIR,
             "error": str(e)
         }
+
+
+def count_saved_images() -> int:
+    """Number of detection images on disk (full scan - only used to seed the stats)"""
+    total = 0
+    for root, dirs, files in os.walk(IMAGES_DIR):
+        # Images are sharded into subdirectories; derived copies are not detections
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        total += sum(1 for f in files if f.endswith('.jpg'))
+    return total
@@ -0,0 +1,287 @@
+"""
+Pothole Record Cache
+====================
+
+Process-level, read-through copy of the pothole table for GET /potholes,
+so list requests neither query the store nor build a Pothole model per
+row:
+- Columnar: NumPy arrays for id/latitude/longitude/confidence/hit_count
+  (slots grow by doubling, deletes leave a tombstone until compaction),
+  interned strings for timestamps and image paths
+- Every row is serialized to JSON once, when it is loaded or changes;
+  responses are joined from those bytes
+- Whole response bodies are kept for the last RECORD_CACHE_RESPONSES
+  distinct queries at the current version, so identical dashboard
+  requests cost one version check
+
+The version is the store's change seq (shared by all workers through the
+change log). Each request compares it with the cached one and, when it
+moved, applies just the logged inserts/updates/deletes - or reloads
+everything when the log no longer reaches back (reset).
+"""
+
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+RECORD_CACHE = os.getenv("RECORD_CACHE", "1") == "1"
+RECORD_CACHE_RESPONSES = int(os.getenv("RECORD_CACHE_RESPONSES", "32"))
+# Queries the cache can answer (others go to the store)
+CACHE_SORTS = ("id", "confidence")
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def serialize_record(record: dict) -> bytes:
+    """JSON of one record in Pothole field order and types"""
+    row = {
+        "id": int(record["id"]),
+        "latitude": float(record["latitude"]),
+        "longitude": float(record["longitude"]),
+        "timestamp": record["timestamp"],
+        "confidence": float(record["confidence"]) if record.get("confidence") is not None else None,
+        "image_path": record.get("image_path"),
+        "hit_count": int(record.get("hit_count") or 1),
+        "last_seen": record.get("last_seen"),
+    }
+    return json.dumps(row, separators=(",", ":")).encode()
+
+
+class RecordCache:
+    """Columnar, pre-serialized pothole table kept in step with the change log"""
+
+    def __init__(self, store, max_responses: int = RECORD_CACHE_RESPONSES):
+        self.store = store
+        self.max_responses = max(0, max_responses)
+        self._lock = threading.RLock()
+        self.seq = -1  # Nothing loaded
+        self.reloads = 0
+        self.hits = 0
+        self.misses = 0
+        self._responses: "OrderedDict[tuple, Tuple[bytes, Optional[int]]]" = OrderedDict()
+        self._reset_columns(0)
+
+    # ----- storage -----
+
+    def _reset_columns(self, capacity: int):
+        capacity = max(capacity, 1024)
+        self._size = 0  # Slots used (including tombstones)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._lat = np.zeros(capacity, dtype=np.float64)
+        self._lon = np.zeros(capacity, dtype=np.float64)
+        self._conf = np.full(capacity, np.nan, dtype=np.float64)  # NaN = no confidence
+        self._hits = np.zeros(capacity, dtype=np.int64)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._timestamp = []
+        self._image_path = []
+        self._last_seen = []
+        self._json = []
+        self._slot = {}  # id -> slot
+        self._ids_sorted = True  # Slots are in ascending id order
+
+    def _grow(self):
+        capacity = len(self._ids) * 2
+        for name in ("_ids", "_lat", "_lon", "_hits", "_alive"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+        conf = np.full(capacity, np.nan, dtype=np.float64)
+        conf[:self._size] = self._conf[:self._size]
+        self._conf = conf
+
+    def _set(self, slot: int, record: dict):
+        self._lat[slot] = record["latitude"]
+        self._lon[slot] = record["longitude"]
+        confidence = record.get("confidence")
+        self._conf[slot] = np.nan if confidence is None else confidence
+        self._hits[slot] = record.get("hit_count") or 1
+        self._timestamp[slot] = _intern(record["timestamp"])
+        self._image_path[slot] = _intern(record.get("image_path"))
+        self._last_seen[slot] = _intern(record.get("last_seen"))
+        self._json[slot] = serialize_record(record)
+
+    def _upsert(self, record: dict):
+        slot = self._slot.get(record["id"])
+        if slot is None:
+            if self._size == len(self._ids):
+                self._grow()
+            slot = self._size
+            self._size += 1
+            if slot and record["id"] < self._ids[slot - 1]:
+                self._ids_sorted = False
+            self._ids[slot] = record["id"]
+            self._alive[slot] = True
+            self._slot[record["id"]] = slot
+            self._timestamp.append(None)
+            self._image_path.append(None)
+            self._last_seen.append(None)
+            self._json.append(None)
+        self._set(slot, record)
+
+    def _delete(self, pothole_id: int):
+        slot = self._slot.pop(pothole_id, None)
+        if slot is not None:
+            self._alive[slot] = False
+            self._json[slot] = None
+
+    def _compact(self):
+        """Drop tombstones once they are a quarter of the slots"""
+        if self._size - len(self._slot) <= self._size // 4:
+            return
+        keep = np.flatnonzero(self._alive[:self._size])
+        if not self._ids_sorted:
+            keep = keep[np.argsort(self._ids[keep], kind="stable")]
+        columns = {name: getattr(self, name)[keep] for name in ("_ids", "_lat", "_lon", "_conf", "_hits")}
+        lists = {name: [getattr(self, name)[i] for i in keep]
+                 for name in ("_timestamp", "_image_path", "_last_seen", "_json")}
+        self._reset_columns(len(keep) * 2)
+        self._size = len(keep)
+        for name, column in columns.items():
+            getattr(self, name)[:self._size] = column
+        self._alive[:self._size] = True
+        for name, values in lists.items():
+            setattr(self, name, values)
+        self._slot = {int(pothole_id): slot for slot, pothole_id in enumerate(self._ids[:self._size])}
+
+    def _reload(self):
+        self._reset_columns(0)
+        for record in self.store.iter_all():
+            self._upsert(record)
+        self.reloads += 1
+
+    def refresh(self, latest: Optional[int] = None) -> int:
+        """Bring the cache up to the store's change seq (latest if known); returns it"""
+        if latest is None:
+            latest = self.store.current_seq()
+        if latest == self.seq:
+            return latest
+        with self._lock:
+            if latest == self.seq:
+                return latest
+            changes, reset = ([], True) if self.seq < 0 else self.store.changes(self.seq)
+            if reset:
+                # Version first: changes made during the reload are re-applied next time
+                latest = self.store.current_seq()
+                self._reload()
+            else:
+                for change in changes:
+                    if change["op"] == "delete" or change["pothole"] is None:
+                        self._delete(change["id"])
+                    else:
+                        self._upsert(change["pothole"])
+                    latest = change["seq"]
+                self._compact()
+            self.seq = latest
+            self._responses.clear()
+            return latest
+
+    def __len__(self):
+        return len(self._slot)
+
+    # ----- queries -----
+
+    def _project(self, slot: int, fields: Sequence[str]) -> dict:
+        row = {}
+        for field in fields:
+            if field == "id":
+                row[field] = int(self._ids[slot])
+            elif field == "latitude":
+                row[field] = float(self._lat[slot])
+            elif field == "longitude":
+                row[field] = float(self._lon[slot])
+            elif field == "confidence":
+                value = self._conf[slot]
+                row[field] = None if np.isnan(value) else float(value)
+            elif field == "hit_count":
+                row[field] = int(self._hits[slot])
+            else:
+                row[field] = getattr(self, f"_{field}")[slot]
+        return row
+
+    def select(self, sort: str = "id", descending: bool = False, after_id: Optional[int] = None,
+               limit: Optional[int] = None, min_confidence: Optional[float] = None,
+               max_confidence: Optional[float] = None,
+               fields: Optional[Sequence[str]] = None) -> Tuple[bytes, Optional[int]]:
+        """
+        JSON array body for a GET /potholes query (see PotholeStore.query).
+
+        Returns:
+            (body, id of the last row when the page is full, else None)
+        Raises:
+            KeyError: after_id is not (or no longer) a pothole (sorts other than id)
+        """
+        key = (sort, descending, after_id, limit, min_confidence, max_confidence,
+               tuple(fields) if fields else None)
+        with self._lock:
+            cached = self._responses.get(key)
+            if cached is not None:
+                self._responses.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+            size = self._size
+            mask = self._alive[:size].copy()
+            conf = self._conf[:size]
+            with np.errstate(invalid="ignore"):  # NaN (no confidence) never matches
+                if min_confidence is not None:
+                    mask &= conf >= min_confidence
+                if max_confidence is not None:
+                    mask &= conf <= max_confidence
+            ids = self._ids[:size]
+            sort_values = ids if sort == "id" else np.where(np.isnan(conf), -1.0, conf)
+
+            if after_id is not None:
+                if sort == "id":
+                    anchor_value = after_id
+                elif after_id in self._slot:
+                    anchor_value = sort_values[self._slot[after_id]]
+                else:
+                    raise KeyError(after_id)
+                if descending:
+                    mask &= (sort_values < anchor_value) | ((sort_values == anchor_value) & (ids < after_id))
+                else:
+                    mask &= (sort_values > anchor_value) | ((sort_values == anchor_value) & (ids > after_id))
+
+            slots = np.flatnonzero(mask)
+            if sort == "id" and self._ids_sorted:
+                order = slots[::-1] if descending else slots
+            else:
+                # Ties broken by id, like the store's ORDER BY <field>, id
+                order = slots[np.lexsort((ids[slots], sort_values[slots]))]
+                if descending:
+                    order = order[::-1]
+            if limit is not None:
+                order = order[:limit]
+
+            if fields:
+                rows = [json.dumps(self._project(slot, fields), separators=(",", ":")).encode()
+                        for slot in order.tolist()]
+            else:
+                rows = [self._json[slot] for slot in order.tolist()]
+            body = b"[" + b",".join(rows) + b"]"
+            last_id = int(ids[order[-1]]) if limit is not None and len(order) == limit else None
+
+            if self.max_responses:
+                self._responses[key] = (body, last_id)
+                while len(self._responses) > self.max_responses:
+                    self._responses.popitem(last=False)
+            return body, last_id
+
+    def stats(self) -> dict:
+        return {
+            "rows": len(self._slot),
+            "seq": self.seq,
+            "reloads": self.reloads,
+            "response_hits": self.hits,
+            "response_misses": self.misses,
+            "cached_responses": len(self._responses),
+        }
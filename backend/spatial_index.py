@@ -0,0 +1,131 @@
+"""
+Spatial Index for Pothole Queries
+=================================
+
+In-memory uniform grid over latitude/longitude.
+- Each pothole is bucketed into a CELL_SIZE_DEG x CELL_SIZE_DEG cell
+- Bounding-box queries only visit the cells overlapping the box
+- Radius queries visit the cells overlapping the circle's bounding box,
+  then filter by great-circle (haversine) distance
+
+The index holds only (id, lat, lon, confidence); full records are fetched
+from the store.
+"""
+
+import math
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# ~1.1 km cells at the equator; a city district spans a handful of cells
+CELL_SIZE_DEG = float(os.getenv("SPATIAL_CELL_SIZE_DEG", "0.01"))
+EARTH_RADIUS_M = 6371000.0
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in metres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GridIndex:
+    """Uniform grid spatial index (thread-safe)"""
+
+    def __init__(self, cell_size_deg: float = CELL_SIZE_DEG):
+        self.cell_size = cell_size_deg
+        self._cells: Dict[Tuple[int, int], Dict[int, tuple]] = {}
+        self._points: Dict[int, tuple] = {}
+        self._lock = threading.RLock()
+        self.loaded = False
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+
+    def __len__(self):
+        return len(self._points)
+
+    def load(self, records: Iterable[dict]):
+        """(Re)build the index from store records"""
+        with self._lock:
+            self._cells.clear()
+            self._points.clear()
+            for record in records:
+                self.insert(record["id"], record["latitude"], record["longitude"],
+                            record.get("confidence"))
+            self.loaded = True
+
+    def insert(self, pothole_id: int, lat: float, lon: float, confidence: Optional[float] = None):
+        with self._lock:
+            if pothole_id in self._points:
+                self.remove(pothole_id)
+            point = (lat, lon, confidence)
+            self._points[pothole_id] = point
+            self._cells.setdefault(self._cell(lat, lon), {})[pothole_id] = point
+
+    def get(self, pothole_id: int) -> Optional[tuple]:
+        """(lat, lon, confidence) of an indexed pothole, or None"""
+        return self._points.get(pothole_id)
+
+    def remove(self, pothole_id: int):
+        with self._lock:
+            point = self._points.pop(pothole_id, None)
+            if point is None:
+                return
+            key = self._cell(point[0], point[1])
+            cell = self._cells.get(key)
+            if cell is not None:
+                cell.pop(pothole_id, None)
+                if not cell:
+                    del self._cells[key]
+
+    def _scan(self, min_lat, min_lon, max_lat, max_lon):
+        """Yield (id, lat, lon, confidence) for every point inside the box"""
+        row_min, col_min = self._cell(min_lat, min_lon)
+        row_max, col_max = self._cell(max_lat, max_lon)
+        n_cells = (row_max - row_min + 1) * (col_max - col_min + 1)
+
+        # Huge boxes (zoomed-out maps) touch more cells than there are points
+        if n_cells > len(self._cells):
+            candidates = (
+                item for key, cell in self._cells.items()
+                if row_min <= key[0] <= row_max and col_min <= key[1] <= col_max
+                for item in cell.items()
+            )
+        else:
+            candidates = (
+                item
+                for row in range(row_min, row_max + 1)
+                for col in range(col_min, col_max + 1)
+                for item in self._cells.get((row, col), {}).items()
+            )
+
+        for pothole_id, (lat, lon, confidence) in candidates:
+            if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+                yield pothole_id, lat, lon, confidence
+
+    def query_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> List[int]:
+        """IDs inside the bounding box, sorted"""
+        with self._lock:
+            return sorted(pid for pid, _, _, _ in self._scan(min_lat, min_lon, max_lat, max_lon))
+
+    def points_in_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> list:
+        """(id, lat, lon, confidence) inside the bounding box"""
+        with self._lock:
+            return list(self._scan(min_lat, min_lon, max_lat, max_lon))
+
+    def query_radius(self, lat: float, lon: float, radius_m: float) -> List[Tuple[int, float]]:
+        """(id, distance_m) within radius_m of (lat, lon), nearest first"""
+        dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        dlon = min(180.0, dlat / cos_lat)
+        with self._lock:
+            hits = []
+            for pid, plat, plon, _ in self._scan(lat - dlat, lon - dlon, lat + dlat, lon + dlon):
+                distance = haversine_m(lat, lon, plat, plon)
+                if distance <= radius_m:
+                    hits.append((pid, distance))
+        hits.sort(key=lambda hit: hit[1])
+        return hits
@@ -0,0 +1,1031 @@
+"""
+Pothole Storage Layer
+=====================
+
+Pluggable persistence for pothole records:
+- SQLiteStore - indexed embedded database (WAL mode), default backend
+- CSVStore    - flat-file layout (legacy CSV_HEADERS files are upgraded in place),
+                safe for several uvicorn workers (file lock + atomic rewrites)
+- import_csv() / export_csv() - one-shot migration and optional CSV export
+
+Every insert/delete is also appended to a change log with a monotonic
+sequence number, so clients can sync incrementally (changes since seq N).
+
+Select the backend with STORAGE_BACKEND=sqlite|csv.
+
+Usage as a script:
+    python storage.py import [potholes.csv]   # CSV -> SQLite (keeps ids)
+    python storage.py export [potholes.csv]   # SQLite -> CSV
+"""
+
+import csv
+import heapq
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ============================================
+# Configuration
+# ============================================
+
+# Use persistent disk path if available (production), otherwise use local path (development)
+DATA_DIR = os.getenv("DATA_DIR", ".")  # /data in production, current dir in development
+CSV_FILE = os.path.join(DATA_DIR, "potholes.csv")
+DB_FILE = os.path.join(DATA_DIR, "potholes.db")
+CSV_HEADERS = ["id", "latitude", "longitude", "timestamp", "confidence", "image_path"]
+# Full record layout: repeat reports of the same pothole bump hit_count/last_seen
+RECORD_FIELDS = CSV_HEADERS + ["hit_count", "last_seen"]
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite").lower()
+# Number of change-log entries kept for incremental sync
+CHANGE_LOG_RETENTION = int(os.getenv("CHANGE_LOG_RETENTION", "100000"))
+# CSV backend: deletes (tombstones) and merged reports (new row versions) are
+# logged on the side and folded into the file once this many have piled up
+CSV_COMPACT_DELETES = int(os.getenv("CSV_COMPACT_DELETES", "500"))
+
+
+def row_from_csv(row: dict) -> dict:
+    """Convert a raw CSV DictReader row into a typed pothole record"""
+    return {
+        "id": int(row["id"]),
+        "latitude": float(row["latitude"]),
+        "longitude": float(row["longitude"]),
+        "timestamp": row["timestamp"],
+        "confidence": float(row["confidence"]) if row.get("confidence") else None,
+        "image_path": row.get("image_path") or None,
+        "hit_count": int(row["hit_count"]) if row.get("hit_count") else 1,
+        "last_seen": row.get("last_seen") or None,
+    }
+
+
+def row_to_csv(record: dict) -> list:
+    """Convert a typed pothole record into a CSV row (RECORD_FIELDS order)"""
+    return [
+        record["id"],
+        record["latitude"],
+        record["longitude"],
+        record["timestamp"],
+        record["confidence"] if record.get("confidence") is not None else "",
+        record["image_path"] if record.get("image_path") else "",
+        record.get("hit_count") or 1,
+        record.get("last_seen") or "",
+    ]
+
+
+def new_record(pothole_id, latitude, longitude, timestamp, confidence=None, image_path=None) -> dict:
+    """Record for a first report of a pothole"""
+    return {
+        "id": pothole_id,
+        "latitude": latitude,
+        "longitude": longitude,
+        "timestamp": timestamp,
+        "confidence": confidence,
+        "image_path": image_path,
+        "hit_count": 1,
+        "last_seen": timestamp,
+    }
+
+
+def merge_hit(record: dict, confidence=None, timestamp=None, image_path=None) -> dict:
+    """
+    Fold a repeat report into an existing record.
+
+    hit_count goes up, last_seen moves forward, and confidence/image_path
+    keep the best (highest confidence) report.
+    """
+    merged = dict(record)
+    merged["hit_count"] = (record.get("hit_count") or 1) + 1
+    if timestamp:
+        merged["last_seen"] = timestamp
+    if confidence is not None and (record.get("confidence") is None or confidence > record["confidence"]):
+        merged["confidence"] = confidence
+        if image_path:
+            merged["image_path"] = image_path
+    return merged
+
+
+# Sortable fields of GET /potholes; a missing confidence sorts as -1
+SORT_FIELDS = ("id", "timestamp", "confidence")
+
+
+def sort_key(record: dict, sort: str):
+    """Value a record is ordered by for the given sort field"""
+    if sort == "confidence":
+        return record["confidence"] if record["confidence"] is not None else -1.0
+    return record[sort]
+
+
+def select_records(records: Iterable[dict], sort: Optional[str] = "id", descending: bool = False,
+                   after: Optional[tuple] = None, limit: Optional[int] = None,
+                   min_confidence: Optional[float] = None, max_confidence: Optional[float] = None,
+                   since: Optional[str] = None, until: Optional[str] = None) -> List[dict]:
+    """
+    Filter, order and page records in Python (see PotholeStore.query).
+
+    sort=None keeps the input order; `after` is then (None, id) and the
+    page starts right after that record.
+    """
+    def keep(record):
+        confidence = record["confidence"]
+        if min_confidence is not None and (confidence is None or confidence < min_confidence):
+            return False
+        if max_confidence is not None and (confidence is None or confidence > max_confidence):
+            return False
+        if since is not None and record["timestamp"] < since:
+            return False
+        if until is not None and record["timestamp"] > until:
+            return False
+        return True
+
+    selected = (record for record in records if keep(record))
+
+    if sort is None:
+        if after is not None:
+            selected = list(selected)
+            ids = [record["id"] for record in selected]
+            selected = selected[ids.index(after[1]) + 1:] if after[1] in ids else []
+        selected = list(selected)
+        return selected[:limit] if limit is not None else selected
+
+    def key(record):
+        return (sort_key(record, sort), record["id"])
+
+    if after is not None:
+        if descending:
+            selected = (record for record in selected if key(record) < after)
+        else:
+            selected = (record for record in selected if key(record) > after)
+    if limit is not None:
+        # Only `limit` records are held at a time
+        pick = heapq.nlargest if descending else heapq.nsmallest
+        return pick(limit, selected, key=key)
+    return sorted(selected, key=key, reverse=descending)
+
+
+def read_last_line(path: str, complete: bool = False) -> Optional[str]:
+    """
+    Return the last non-empty line of a text file without reading all of it.
+
+    complete=True ignores a trailing line without a line ending (a row
+    another process is still appending).
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        while position > 0:
+            step = min(4096, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+            text = data[:data.rfind(b"\n") + 1] if complete else data
+            lines = text.rstrip(b"\r\n").splitlines()
+            if len(lines) > 1 or (position == 0 and lines):
+                return lines[-1].decode("utf-8")
+    return None
+
+
+def complete_lines(f) -> Iterator[str]:
+    """Lines of a text file, minus a trailing one that is still being appended"""
+    return (line for line in f if line.endswith("\n"))
+
+
+def truncate_partial_line(path: str):
+    """Cut a line left without its line ending (a writer died mid-append)"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        position = f.seek(0, os.SEEK_END)
+        if position == 0:
+            return
+        f.seek(position - 1)
+        if f.read(1) == b"\n":
+            return
+        while position > 0:
+            step = min(4096, position)
+            position -= step
+            f.seek(position)
+            newline = f.read(step).rfind(b"\n")
+            if newline != -1:
+                f.truncate(position + newline + 1)
+                return
+        f.truncate(0)
+
+
+@contextmanager
+def atomic_write(path: str):
+    """
+    Text file that replaces `path` only once fully written and fsynced.
+
+    Readers see either the old or the new file, never a partial one.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', newline='') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if fcntl is not None:
+        # Make the rename itself durable
+        directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+
+@contextmanager
+def file_lock(path: str):
+    """Exclusive lock shared by every process using `path` (flock / msvcrt)"""
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+            return
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            except OSError:  # LK_LOCK gives up after 10 s
+                continue
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# ============================================
+# Storage Interface
+# ============================================
+
+class PotholeStore:
+    """
+    Base interface for pothole storage backends.
+
+    Records are plain dicts keyed by RECORD_FIELDS.
+    """
+
+    name = "base"
+
+    def initialize(self):
+        """Create the underlying storage if it doesn't exist"""
+        raise NotImplementedError
+
+    def create(self, latitude: float, longitude: float, timestamp: str,
+               confidence: Optional[float] = None, image_path: Optional[str] = None) -> dict:
+        """Insert a pothole and return the stored record with its new ID"""
+        raise NotImplementedError
+
+    def get(self, pothole_id: int) -> Optional[dict]:
+        """Return a single record, or None if it doesn't exist"""
+        raise NotImplementedError
+
+    def get_many(self, pothole_ids: List[int]) -> List[dict]:
+        """Return the records for the given IDs (missing IDs are skipped), in ID order"""
+        raise NotImplementedError
+
+    def record_hit(self, pothole_id: int, confidence: Optional[float] = None,
+                   timestamp: Optional[str] = None, image_path: Optional[str] = None) -> Optional[dict]:
+        """Merge a repeat report into a record (see merge_hit); returns the updated record"""
+        raise NotImplementedError
+
+    def ingest(self, reports: List[dict], hits: List[dict]) -> Tuple[List[dict], List[Optional[dict]]]:
+        """
+        Write a batch of reports in a single transaction.
+
+        reports are new records without an ID (see new_record); hits are
+        {"id", "confidence", "timestamp", "image_path"} repeat reports folded
+        into existing records with merge_hit, in order. Returns (created
+        records, updated record per hit - None if that pothole is gone).
+        """
+        raise NotImplementedError
+
+    def delete(self, pothole_id: int) -> Optional[dict]:
+        """Delete a record and return it, or None if it doesn't exist"""
+        raise NotImplementedError
+
+    def iter_all(self) -> Iterator[dict]:
+        """Yield every record in ID order"""
+        raise NotImplementedError
+
+    def query(self, sort: str = "id", descending: bool = False, after: Optional[tuple] = None,
+              limit: Optional[int] = None, min_confidence: Optional[float] = None,
+              max_confidence: Optional[float] = None, since: Optional[str] = None,
+              until: Optional[str] = None) -> List[dict]:
+        """
+        One page of records.
+
+        Ordered by (sort field, id); `after` is the (sort value, id) of the
+        last record of the previous page (keyset pagination). Timestamps
+        are compared as ISO-8601 strings.
+        """
+        return select_records(self.iter_all(), sort, descending, after, limit,
+                              min_confidence, max_confidence, since, until)
+
+    def count(self) -> int:
+        """Number of stored records"""
+        raise NotImplementedError
+
+    def references_image(self, image_path: str) -> bool:
+        """Whether any record points at this image (identical frames share one file)"""
+        return any(record["image_path"] == image_path for record in self.iter_all())
+
+    def summary(self, since: Optional[str] = None) -> dict:
+        """
+        Aggregates for dashboards: {"count", "confidence_sum", "since_count"}.
+
+        A missing confidence adds 0; since_count counts records reported
+        at/after `since` (ISO-8601 string comparison, None if not given).
+        """
+        count, confidence_sum, since_count = 0, 0.0, 0
+        for record in self.iter_all():
+            count += 1
+            confidence_sum += record["confidence"] or 0.0
+            if since is not None and record["timestamp"] >= since:
+                since_count += 1
+        return {"count": count, "confidence_sum": confidence_sum,
+                "since_count": since_count if since is not None else None}
+
+    def current_seq(self) -> int:
+        """Sequence number of the latest change (0 if none)"""
+        raise NotImplementedError
+
+    def changes(self, since: int, limit: Optional[int] = None) -> Tuple[List[dict], bool]:
+        """
+        Changes after sequence number `since`, oldest first.
+
+        Returns (changes, reset). Each change is
+        {"seq", "op": "insert"|"update"|"delete", "id", "pothole": record or None}.
+        reset is True when `since` is older than the retained log (or from
+        the future), in which case the client must reload everything.
+        """
+        raise NotImplementedError
+
+    def describe(self) -> str:
+        """Human readable location of the store (for startup logs)"""
+        return self.name
+
+
+# ============================================
+# CSV Backend (legacy layout)
+# ============================================
+
+class CSVStore(PotholeStore):
+    """
+    Flat-file store: every read scans the file.
+
+    Safe with several uvicorn workers:
+    - Writes hold an exclusive lock on potholes.lock, so ID allocation,
+      appends and change-log sequence numbers are atomic across processes
+    - Rewrites go to a temp file that is fsynced and renamed over the CSV,
+      so a crash or a concurrent reader never sees a half-written file;
+      readers skip a last row that is still being appended
+    - Deletes append the ID to potholes.deleted.csv (a tombstone) and
+      merged reports append the new version of the row to
+      potholes.updates.csv (last version wins) instead of rewriting the
+      file; reads filter tombstones and substitute updated rows. Both logs
+      are folded into the file every CSV_COMPACT_DELETES entries (or on
+      any rewrite). The highest-ID row is kept as a tombstone so IDs are
+      never reused.
+    """
+
+    name = "csv"
+
+    def __init__(self, csv_file: str = CSV_FILE):
+        self.csv_file = csv_file
+        base = os.path.splitext(csv_file)[0]
+        self.changes_file = f"{base}.changes.csv"
+        self.deleted_file = f"{base}.deleted.csv"
+        self.updates_file = f"{base}.updates.csv"
+        self.lock_file = f"{base}.lock"
+        self._lock = threading.Lock()
+        self._log_cache = {}  # side-log path -> (stat key, parsed contents)
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive write access across threads and worker processes"""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.csv_file) or ".", exist_ok=True)
+            with file_lock(self.lock_file):
+                for path in (self.csv_file, self.changes_file, self.deleted_file, self.updates_file):
+                    truncate_partial_line(path)
+                yield
+
+    def initialize(self):
+        """Create CSV file with headers if it doesn't exist"""
+        with self._locked():
+            self._initialize()
+
+    def _initialize(self):
+        if not os.path.exists(self.csv_file):
+            with atomic_write(self.csv_file) as f:
+                csv.writer(f).writerow(RECORD_FIELDS)
+            print(f"✅ Created new CSV file: {self.csv_file}")
+        else:
+            with open(self.csv_file, 'r', newline='') as f:
+                header = next(csv.reader(f), [])
+            if header != RECORD_FIELDS:
+                # Older 6-column layout: rewrite once with hit_count/last_seen
+                self._rewrite(list(self.iter_all()))
+                print(f"✅ Upgraded CSV layout: {self.csv_file}")
+
+        if not os.path.exists(self.changes_file):
+            # Existing rows count as inserts so a sync from 0 sees everything
+            with atomic_write(self.changes_file) as f:
+                writer = csv.writer(f)
+                writer.writerow(["seq", "op", "id"])
+                for seq, record in enumerate(self.iter_all(), start=1):
+                    writer.writerow([seq, "insert", record["id"]])
+
+    def _rewrite(self, records):
+        """Replace the file with `records` (ID order), folding in both side logs"""
+        records = list(records)
+        top = self._top_row()
+        keep_top = top is not None and top["id"] in self._deleted_ids() and (
+            not records or records[-1]["id"] < top["id"])
+        with atomic_write(self.csv_file) as f:
+            writer = csv.writer(f)
+            writer.writerow(RECORD_FIELDS)
+            writer.writerows(row_to_csv(r) for r in records)
+            if keep_top:
+                writer.writerow(row_to_csv(top))
+        # The CSV is replaced first: readers load the side logs before the CSV
+        with atomic_write(self.deleted_file) as f:
+            writer = csv.writer(f)
+            writer.writerow(["id"])
+            if keep_top:
+                writer.writerow([top["id"]])
+        with atomic_write(self.updates_file) as f:
+            csv.writer(f).writerow(RECORD_FIELDS)
+
+    @staticmethod
+    def _append(path: str, rows):
+        with open(path, 'a', newline='') as f:
+            csv.writer(f).writerows(rows)
+
+    def _read_log(self, path: str, parse, empty):
+        """Parsed side log, re-read only when the file changed"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return empty
+        key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        cached = self._log_cache.get(path)
+        if cached is None or cached[0] != key:
+            with open(path, 'r', newline='') as f:
+                cached = (key, parse(csv.DictReader(complete_lines(f))))
+            self._log_cache[path] = cached
+        return cached[1]
+
+    def _deleted_ids(self) -> frozenset:
+        """Tombstoned IDs"""
+        return self._read_log(self.deleted_file, lambda rows: frozenset(int(row["id"]) for row in rows),
+                              frozenset())
+
+    def _updated_records(self) -> dict:
+        """Latest version of every row changed since the last compaction (id -> record)"""
+        return self._read_log(self.updates_file, lambda rows: {r["id"]: r for r in map(row_from_csv, rows)}, {})
+
+    def _append_log(self, path: str, header: list, rows: list):
+        if not os.path.exists(path):
+            self._append(path, [header])
+        self._append(path, rows)
+
+    def _maybe_compact(self):
+        if len(self._deleted_ids()) + len(self._updated_records()) >= CSV_COMPACT_DELETES:
+            self._rewrite(self.iter_all())
+
+    def _log_change(self, op: str, pothole_id: int):
+        self._log_changes([(op, pothole_id)])
+
+    def _log_changes(self, entries):
+        seq = self.current_seq()
+        self._append(self.changes_file,
+                     ([seq + i, op, pothole_id] for i, (op, pothole_id) in enumerate(entries, start=1)))
+
+    def _top_row(self) -> Optional[dict]:
+        """Last (highest ID) row of the file, tombstoned or not"""
+        line = read_last_line(self.csv_file, complete=True)
+        if not line or line.startswith("id"):
+            return None
+        return row_from_csv(dict(zip(RECORD_FIELDS, next(csv.reader([line])))))
+
+    def _next_id(self) -> int:
+        top = self._top_row()
+        return top["id"] + 1 if top is not None else 1
+
+    def create(self, latitude, longitude, timestamp, confidence=None, image_path=None):
+        with self._locked():
+            self._initialize()
+            record = new_record(self._next_id(), latitude, longitude, timestamp, confidence, image_path)
+            self._append(self.csv_file, [row_to_csv(record)])
+            self._log_change("insert", record["id"])
+        return record
+
+    def get(self, pothole_id):
+        for record in self.iter_all():
+            if record["id"] == pothole_id:
+                return record
+        return None
+
+    def get_many(self, pothole_ids):
+        wanted = set(pothole_ids)
+        return [record for record in self.iter_all() if record["id"] in wanted]
+
+    def delete(self, pothole_id):
+        with self._locked():
+            deleted = self.get(pothole_id)
+            if deleted is None:
+                return None
+
+            self._append_log(self.deleted_file, ["id"], [[pothole_id]])
+            self._log_change("delete", pothole_id)
+            self._maybe_compact()
+        return deleted
+
+    def record_hit(self, pothole_id, confidence=None, timestamp=None, image_path=None):
+        with self._locked():
+            record = self.get(pothole_id)
+            if record is None:
+                return None
+            # New version of the row in the update log; no rewrite
+            record = merge_hit(record, confidence, timestamp, image_path)
+            self._append_log(self.updates_file, RECORD_FIELDS, [row_to_csv(record)])
+            self._log_change("update", pothole_id)
+            self._maybe_compact()
+        return record
+
+    def ingest(self, reports, hits):
+        with self._locked():
+            self._initialize()
+            next_id = self._next_id()
+            created = [dict(report, id=next_id + i) for i, report in enumerate(reports)]
+
+            updated = []
+            current = {record["id"]: record for record in self.get_many({hit["id"] for hit in hits})} if hits else {}
+            for hit in hits:
+                record = current.get(hit["id"])
+                if record is not None:
+                    record = current[hit["id"]] = merge_hit(record, hit.get("confidence"), hit.get("timestamp"),
+                                                            hit.get("image_path"))
+                updated.append(record)
+
+            self._append(self.csv_file, (row_to_csv(record) for record in created))
+            if hits:
+                self._append_log(self.updates_file, RECORD_FIELDS,
+                                 [row_to_csv(record) for record in updated if record is not None])
+            self._log_changes(
+                [("insert", record["id"]) for record in created]
+                + [("update", record["id"]) for record in updated if record is not None]
+            )
+            self._maybe_compact()
+        return created, updated
+
+    def iter_all(self):
+        if not os.path.exists(self.csv_file):
+            return
+        # Side logs first: a compaction renames the CSV before clearing them
+        deleted = self._deleted_ids()
+        updated = self._updated_records()
+        with open(self.csv_file, 'r', newline='') as f:
+            for row in csv.DictReader(complete_lines(f)):
+                record = row_from_csv(row)
+                if record["id"] not in deleted:
+                    yield updated.get(record["id"], record)
+
+    def count(self):
+        return sum(1 for _ in self.iter_all())
+
+    def current_seq(self):
+        last = read_last_line(self.changes_file, complete=True)
+        if not last or last.startswith("seq"):
+            return 0
+        return int(last.split(",", 1)[0])
+
+    def changes(self, since, limit=None):
+        if not os.path.exists(self.changes_file):
+            return [], since != 0
+        with open(self.changes_file, 'r', newline='') as f:
+            log = [
+                {"seq": int(row["seq"]), "op": row["op"], "id": int(row["id"])}
+                for row in csv.DictReader(complete_lines(f)) if int(row["seq"]) > since
+            ]
+        if since > self.current_seq():
+            return [], True
+        if limit is not None:
+            log = log[:limit]
+        upserted = {c["id"] for c in log if c["op"] != "delete"}
+        records = {r["id"]: r for r in self.get_many(upserted)} if upserted else {}
+        for change in log:
+            change["pothole"] = records.get(change["id"]) if change["op"] != "delete" else None
+        return log, False
+
+    def describe(self):
+        return f"CSV file: {self.csv_file}"
+
+
+# ============================================
+# SQLite Backend
+# ============================================
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS potholes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    timestamp TEXT NOT NULL,
+    confidence REAL,
+    image_path TEXT,
+    hit_count INTEGER NOT NULL DEFAULT 1,
+    last_seen TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_potholes_timestamp ON potholes(timestamp);
+CREATE INDEX IF NOT EXISTS idx_potholes_location ON potholes(latitude, longitude);
+CREATE INDEX IF NOT EXISTS idx_potholes_confidence ON potholes(confidence);
+CREATE INDEX IF NOT EXISTS idx_potholes_confidence_sort ON potholes(COALESCE(confidence, -1));
+CREATE INDEX IF NOT EXISTS idx_potholes_image ON potholes(image_path);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    op TEXT NOT NULL,
+    pothole_id INTEGER NOT NULL
+);
+"""
+
+COLUMNS = ", ".join(RECORD_FIELDS)
+# Rows fetched per query by SQLiteStore.iter_all()
+ITER_PAGE_SIZE = 1000
+# ORDER BY expressions for SORT_FIELDS (must match the indexes above)
+SORT_COLUMNS = {"id": "id", "timestamp": "timestamp", "confidence": "COALESCE(confidence, -1)"}
+
+
+class SQLiteStore(PotholeStore):
+    """
+    SQLite store in WAL mode.
+
+    IDs come from an AUTOINCREMENT primary key, so concurrent uvicorn
+    workers never hand out the same ID and lookups/deletes use the index.
+    Each thread gets its own connection (FastAPI runs sync endpoints in a
+    thread pool); WAL lets readers proceed while a writer commits.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_file: str = DB_FILE, legacy_csv: Optional[str] = CSV_FILE):
+        self.db_file = db_file
+        self.legacy_csv = legacy_csv
+        self._local = threading.local()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_file) or ".", exist_ok=True)
+            # isolation_level=None: autocommit, transactions are explicit (BEGIN IMMEDIATE)
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def initialize(self):
+        """Create schema and import the legacy CSV once (if present)"""
+        if self._initialized:
+            return
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        self._initialized = True
+
+        # Databases created before hit_count/last_seen existed
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(potholes)")}
+        if "hit_count" not in existing:
+            conn.execute("ALTER TABLE potholes ADD COLUMN hit_count INTEGER NOT NULL DEFAULT 1")
+        if "last_seen" not in existing:
+            conn.execute("ALTER TABLE potholes ADD COLUMN last_seen TEXT")
+
+        # Databases created before the change log existed: backfill inserts
+        if conn.execute("SELECT 1 FROM changes LIMIT 1").fetchone() is None:
+            with self._write() as conn:
+                conn.execute("INSERT INTO changes (op, pothole_id) "
+                             "SELECT 'insert', id FROM potholes ORDER BY id")
+
+        imported = conn.execute("SELECT value FROM meta WHERE key = 'csv_imported'").fetchone()
+        if imported is None:
+            if self.legacy_csv and os.path.exists(self.legacy_csv):
+                count = import_csv(self, self.legacy_csv)
+                print(f"✅ Imported {count} potholes from {self.legacy_csv}")
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('csv_imported', '1')")
+
+    @staticmethod
+    def _record(row: sqlite3.Row) -> dict:
+        return {key: row[key] for key in RECORD_FIELDS}
+
+    @contextmanager
+    def _write(self):
+        """Write transaction (BEGIN IMMEDIATE takes the write lock up front)"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _log_change(conn: sqlite3.Connection, op: str, pothole_id: int):
+        seq = conn.execute(
+            "INSERT INTO changes (op, pothole_id) VALUES (?, ?)", (op, pothole_id)
+        ).lastrowid
+        # Trim the log every 1000 changes
+        if seq % 1000 == 0:
+            conn.execute("DELETE FROM changes WHERE seq <= ?", (seq - CHANGE_LOG_RETENTION,))
+
+    def create(self, latitude, longitude, timestamp, confidence=None, image_path=None):
+        self.initialize()
+        with self._write() as conn:
+            pothole_id = conn.execute(
+                "INSERT INTO potholes (latitude, longitude, timestamp, confidence, image_path, "
+                "hit_count, last_seen) VALUES (?, ?, ?, ?, ?, 1, ?)",
+                (latitude, longitude, timestamp, confidence, image_path, timestamp),
+            ).lastrowid
+            self._log_change(conn, "insert", pothole_id)
+        return new_record(pothole_id, latitude, longitude, timestamp, confidence, image_path)
+
+    def insert_records(self, records) -> int:
+        """Insert records keeping their IDs, in a single transaction"""
+        self.initialize()
+        records = list(records)
+        with self._write() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO potholes ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((r["id"], r["latitude"], r["longitude"], r["timestamp"], r["confidence"],
+                  r["image_path"], r.get("hit_count") or 1, r.get("last_seen") or r["timestamp"])
+                 for r in records),
+            )
+            conn.executemany(
+                "INSERT INTO changes (op, pothole_id) VALUES ('insert', ?)",
+                ((r["id"],) for r in records),
+            )
+        return len(records)
+
+    def get(self, pothole_id):
+        self.initialize()
+        row = self._connect().execute(
+            f"SELECT {COLUMNS} FROM potholes WHERE id = ?", (pothole_id,)
+        ).fetchone()
+        return self._record(row) if row else None
+
+    def get_many(self, pothole_ids):
+        self.initialize()
+        conn = self._connect()
+        ids = sorted(set(pothole_ids))
+        records = []
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            cursor = conn.execute(
+                f"SELECT {COLUMNS} FROM potholes WHERE id IN ({placeholders}) ORDER BY id", chunk
+            )
+            records.extend(self._record(row) for row in cursor)
+        return records
+
+    def delete(self, pothole_id):
+        self.initialize()
+        with self._write() as conn:
+            row = conn.execute(
+                f"SELECT {COLUMNS} FROM potholes WHERE id = ?", (pothole_id,)
+            ).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM potholes WHERE id = ?", (pothole_id,))
+                self._log_change(conn, "delete", pothole_id)
+        return self._record(row) if row else None
+
+    def _apply_hit(self, conn, pothole_id, confidence, timestamp, image_path) -> Optional[dict]:
+        row = conn.execute(
+            f"SELECT {COLUMNS} FROM potholes WHERE id = ?", (pothole_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        merged = merge_hit(self._record(row), confidence, timestamp, image_path)
+        conn.execute(
+            "UPDATE potholes SET confidence = ?, image_path = ?, hit_count = ?, last_seen = ? "
+            "WHERE id = ?",
+            (merged["confidence"], merged["image_path"], merged["hit_count"],
+             merged["last_seen"], pothole_id),
+        )
+        self._log_change(conn, "update", pothole_id)
+        return merged
+
+    def record_hit(self, pothole_id, confidence=None, timestamp=None, image_path=None):
+        self.initialize()
+        with self._write() as conn:
+            return self._apply_hit(conn, pothole_id, confidence, timestamp, image_path)
+
+    def ingest(self, reports, hits):
+        self.initialize()
+        created, updated = [], []
+        with self._write() as conn:
+            for report in reports:
+                pothole_id = conn.execute(
+                    "INSERT INTO potholes (latitude, longitude, timestamp, confidence, image_path, "
+                    "hit_count, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (report["latitude"], report["longitude"], report["timestamp"],
+                     report["confidence"], report["image_path"], report.get("hit_count") or 1,
+                     report.get("last_seen") or report["timestamp"]),
+                ).lastrowid
+                self._log_change(conn, "insert", pothole_id)
+                created.append(dict(report, id=pothole_id))
+            for hit in hits:
+                updated.append(self._apply_hit(conn, hit["id"], hit.get("confidence"),
+                                               hit.get("timestamp"), hit.get("image_path")))
+        return created, updated
+
+    def iter_all(self):
+        # Keyset pages: constant memory, and each page uses the calling
+        # thread's connection (streaming responses resume on any thread)
+        self.initialize()
+        last_id = 0
+        while True:
+            rows = self._connect().execute(
+                f"SELECT {COLUMNS} FROM potholes WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, ITER_PAGE_SIZE),
+            ).fetchall()
+            for row in rows:
+                yield self._record(row)
+            if len(rows) < ITER_PAGE_SIZE:
+                return
+            last_id = rows[-1]["id"]
+
+    def query(self, sort="id", descending=False, after=None, limit=None, min_confidence=None,
+              max_confidence=None, since=None, until=None):
+        self.initialize()
+        column = SORT_COLUMNS[sort]
+        where, params = [], []
+        if min_confidence is not None:
+            where.append("confidence >= ?")
+            params.append(min_confidence)
+        if max_confidence is not None:
+            where.append("confidence <= ?")
+            params.append(max_confidence)
+        if since is not None:
+            where.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("timestamp <= ?")
+            params.append(until)
+        if after is not None:
+            op = "<" if descending else ">"
+            if sort == "id":
+                where.append(f"id {op} ?")
+                params.append(after[1])
+            else:
+                where.append(f"({column}, id) {op} (?, ?)")
+                params.extend(after)
+
+        direction = "DESC" if descending else "ASC"
+        sql = f"SELECT {COLUMNS} FROM potholes"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {column} {direction}" + (f", id {direction}" if sort != "id" else "")
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [self._record(row) for row in self._connect().execute(sql, params)]
+
+    def count(self):
+        self.initialize()
+        return self._connect().execute("SELECT COUNT(*) FROM potholes").fetchone()[0]
+
+    def summary(self, since=None):
+        self.initialize()
+        conn = self._connect()
+        count, confidence_sum = conn.execute("SELECT COUNT(*), TOTAL(confidence) FROM potholes").fetchone()
+        since_count = None
+        if since is not None:
+            # Uses idx_potholes_timestamp
+            since_count = conn.execute("SELECT COUNT(*) FROM potholes WHERE timestamp >= ?", (since,)).fetchone()[0]
+        return {"count": count, "confidence_sum": confidence_sum, "since_count": since_count}
+
+    def references_image(self, image_path):
+        self.initialize()
+        return self._connect().execute(
+            "SELECT 1 FROM potholes WHERE image_path = ? LIMIT 1", (image_path,)
+        ).fetchone() is not None
+
+    def current_seq(self):
+        self.initialize()
+        return self._connect().execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def changes(self, since, limit=None):
+        self.initialize()
+        conn = self._connect()
+        oldest, latest = conn.execute(
+            "SELECT COALESCE(MIN(seq), 0), COALESCE(MAX(seq), 0) FROM changes"
+        ).fetchone()
+        if since > latest or (since < oldest - 1):
+            return [], True
+
+        cursor = conn.execute(
+            f"SELECT c.seq, c.op, c.pothole_id, {', '.join('p.' + c for c in RECORD_FIELDS)} "
+            "FROM changes c LEFT JOIN potholes p ON p.id = c.pothole_id AND c.op != 'delete' "
+            "WHERE c.seq > ? ORDER BY c.seq LIMIT ?",
+            (since, -1 if limit is None else limit),
+        )
+        changes = []
+        for row in cursor:
+            changes.append({
+                "seq": row["seq"],
+                "op": row["op"],
+                "id": row["pothole_id"],
+                "pothole": self._record(row) if row["id"] is not None else None,
+            })
+        return changes, False
+
+    def describe(self):
+        return f"SQLite database: {self.db_file}"
+
+
+# ============================================
+# Import / Export
+# ============================================
+
+def import_csv(store: SQLiteStore, csv_file: str = CSV_FILE) -> int:
+    """One-shot import of a CSV_HEADERS file into SQLite, keeping IDs"""
+    with open(csv_file, 'r', newline='') as f:
+        records = [row_from_csv(row) for row in csv.DictReader(f) if row.get("id")]
+    if not records:
+        return 0
+    return store.insert_records(records)
+
+
+def export_csv(store: PotholeStore, csv_file: str = CSV_FILE) -> int:
+    """Write every record to a CSV file (RECORD_FIELDS layout, atomically replaced)"""
+    count = 0
+    with atomic_write(csv_file) as f:
+        writer = csv.writer(f)
+        writer.writerow(RECORD_FIELDS)
+        for record in store.iter_all():
+            writer.writerow(row_to_csv(record))
+            count += 1
+    return count
+
+
+# ============================================
+# Backend Selection
+# ============================================
+
+_store = None
+
+
+def get_store() -> PotholeStore:
+    """Return the configured store (created once per process)"""
+    global _store
+    if _store is None:
+        if STORAGE_BACKEND == "csv":
+            _store = CSVStore()
+        elif STORAGE_BACKEND == "sqlite":
+            _store = SQLiteStore()
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+    return _store
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    path = sys.argv[2] if len(sys.argv) > 2 else CSV_FILE
+    store = SQLiteStore(legacy_csv=None)
+    store.initialize()
+
+    if command == "import":
+        print(f"✅ Imported {import_csv(store, path)} potholes from {path} into {DB_FILE}")
+    elif command == "export":
+        print(f"✅ Exported {export_csv(store, path)} potholes from {DB_FILE} to {path}")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,93 @@
+"""
+Derivative Images
+=================
+
+Downscaled copies of detection images for map popups and history rows:
+- thumb  - long side THUMB_SIZE px (default 320)
+- medium - long side MEDIUM_SIZE px (default 800)
+
+Derivatives are made on first request and cached on disk under
+<images dir>/.derived/<size>/, as WebP for clients that accept it and
+JPEG otherwise. JPEG originals are opened with Image.draft(), so the
+decoder itself scales by 1/2..1/8 instead of producing the full bitmap.
+"""
+
+import os
+import threading
+from typing import Optional
+
+from PIL import Image
+
+IMAGE_SIZES = {
+    "thumb": int(os.getenv("THUMB_SIZE", "320")),
+    "medium": int(os.getenv("MEDIUM_SIZE", "800")),
+}
+DERIVED_QUALITY = int(os.getenv("DERIVED_IMAGE_QUALITY", "80"))
+DERIVED_DIRNAME = ".derived"
+# format -> (PIL format, file extension, media type)
+DERIVED_FORMATS = {
+    "webp": ("WEBP", "webp", "image/webp"),
+    "jpeg": ("JPEG", "jpg", "image/jpeg"),
+}
+
+# Striped locks: concurrent first requests for one image render it once
+_locks = [threading.Lock() for _ in range(16)]
+
+
+def derived_path(images_dir: str, name: str, size: str, fmt: str) -> str:
+    """Cache location of one derivative of images_dir/name"""
+    extension = DERIVED_FORMATS[fmt][1]
+    return os.path.join(images_dir, DERIVED_DIRNAME, size, f"{os.path.splitext(name)[0]}.{extension}")
+
+
+def _is_fresh(target: str, source: str) -> bool:
+    try:
+        return os.path.getmtime(target) >= os.path.getmtime(source)
+    except OSError:
+        return False
+
+
+def render(source: str, target: str, max_side: int, fmt: str):
+    """Write a downscaled copy of source (atomically, via a temp file)"""
+    with Image.open(source) as image:
+        image.draft("RGB", (max_side, max_side))  # JPEG: decode at reduced scale
+        image = image.convert("RGB")
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            image.save(tmp_path, DERIVED_FORMATS[fmt][0], quality=DERIVED_QUALITY)
+            os.replace(tmp_path, target)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def get_derived(images_dir: str, name: str, size: str, fmt: str) -> str:
+    """Path of the cached derivative, rendering it if missing or stale"""
+    source = os.path.join(images_dir, name)
+    target = derived_path(images_dir, name, size, fmt)
+    if _is_fresh(target, source):
+        return target
+    with _locks[hash(target) % len(_locks)]:
+        if not _is_fresh(target, source):
+            render(source, target, IMAGE_SIZES[size], fmt)
+    return target
+
+
+def remove_derived(images_dir: str, image_path: Optional[str]):
+    """Delete every cached derivative of an image"""
+    if not image_path:
+        return
+    name = os.path.relpath(os.path.realpath(image_path), os.path.realpath(images_dir))
+    if name.startswith(".."):
+        return
+    for size in IMAGE_SIZES:
+        for fmt in DERIVED_FORMATS:
+            path = derived_path(images_dir, name, size, fmt)
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
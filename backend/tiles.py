@@ -0,0 +1,140 @@
+"""
+Tiled Pothole Clustering
+========================
+
+Server-side aggregation for the map (slippy-map / Web Mercator tiles):
+- GET /potholes/tiles/{z}/{x}/{y} returns clusters for one tile
+- Each tile is split into CLUSTER_GRID x CLUSTER_GRID cells; every
+  non-empty cell becomes one cluster with count, centroid and
+  mean/max confidence
+- Tiles are cached and invalidated per point: a create/delete only drops
+  the one tile per zoom level that contains the pothole
+"""
+
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+MAX_ZOOM = 22
+CLUSTER_GRID = int(os.getenv("TILE_CLUSTER_GRID", "8"))
+TILE_CACHE_SIZE = int(os.getenv("TILE_CACHE_SIZE", "4096"))
+MAX_MERCATOR_LAT = 85.0511287798
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(min_lon, min_lat, max_lon, max_lat) of a tile"""
+    n = 2 ** z
+    min_lon = x / n * 360.0 - 180.0
+    max_lon = (x + 1) / n * 360.0 - 180.0
+    max_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    min_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def tile_position(lat: float, lon: float, z: int) -> Tuple[float, float]:
+    """Fractional tile coordinates of a point at zoom z"""
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    n = 2 ** z
+    x = (lon + 180.0) / 360.0 * n
+    lat_rad = math.radians(lat)
+    y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+    return min(max(x, 0.0), n - 1e-9), min(max(y, 0.0), n - 1e-9)
+
+
+def tile_for(lat: float, lon: float, z: int) -> Tuple[int, int]:
+    """Tile (x, y) containing a point at zoom z"""
+    x, y = tile_position(lat, lon, z)
+    return int(x), int(y)
+
+
+def build_tile(points, z: int, x: int, y: int) -> dict:
+    """Aggregate (id, lat, lon, confidence) points of one tile into clusters"""
+    cells = {}
+    for pothole_id, lat, lon, confidence in points:
+        px, py = tile_position(lat, lon, z)
+        # Points exactly on the tile edge belong to this tile
+        col = min(CLUSTER_GRID - 1, max(0, int((px - x) * CLUSTER_GRID)))
+        row = min(CLUSTER_GRID - 1, max(0, int((py - y) * CLUSTER_GRID)))
+        cell = cells.get((row, col))
+        if cell is None:
+            cell = cells[(row, col)] = {
+                "count": 0, "lat_sum": 0.0, "lon_sum": 0.0,
+                "conf_sum": 0.0, "conf_count": 0, "max_confidence": None, "id": pothole_id,
+            }
+        cell["count"] += 1
+        cell["lat_sum"] += lat
+        cell["lon_sum"] += lon
+        if confidence is not None:
+            cell["conf_sum"] += confidence
+            cell["conf_count"] += 1
+            if cell["max_confidence"] is None or confidence > cell["max_confidence"]:
+                cell["max_confidence"] = confidence
+
+    clusters = []
+    for cell in cells.values():
+        cluster = {
+            "latitude": cell["lat_sum"] / cell["count"],
+            "longitude": cell["lon_sum"] / cell["count"],
+            "count": cell["count"],
+            "mean_confidence": cell["conf_sum"] / cell["conf_count"] if cell["conf_count"] else None,
+            "max_confidence": cell["max_confidence"],
+        }
+        if cell["count"] == 1:
+            cluster["id"] = cell["id"]
+        clusters.append(cluster)
+
+    return {
+        "z": z,
+        "x": x,
+        "y": y,
+        "count": sum(cluster["count"] for cluster in clusters),
+        "clusters": clusters,
+    }
+
+
+class TileCache:
+    """LRU cache of built tiles with per-point invalidation (thread-safe)"""
+
+    def __init__(self, max_tiles: int = TILE_CACHE_SIZE):
+        self.max_tiles = max_tiles
+        self._tiles: "OrderedDict[Tuple[int, int, int], dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a tile built concurrently with a
+        # write is not cached with stale contents
+        self.generation = 0
+
+    def get(self, key: Tuple[int, int, int]) -> Optional[dict]:
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+            return tile
+
+    def put(self, key: Tuple[int, int, int], tile: dict, generation: int):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._tiles[key] = tile
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+
+    def invalidate_point(self, lat: float, lon: float):
+        """Drop the cached tile containing this point at every zoom level"""
+        with self._lock:
+            self.generation += 1
+            if not self._tiles:
+                return
+            for z in range(MAX_ZOOM + 1):
+                x, y = tile_for(lat, lon, z)
+                self._tiles.pop((z, x, y), None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._tiles.clear()
+
+    def __len__(self):
+        return len(self._tiles)
@@ -0,0 +1,13 @@
+// Shared by map.html and history.html (served from public/ as /pothole-images.js,
+// loaded as a classic script before the page's own script)
+
+// URL of a detection image on the backend at apiUrl
+// (size: 'thumb' | 'medium' | null for the original)
+window.imageUrl = function (apiUrl, imagePath, size) {
+    const prefix = 'detected_potholes/';
+    const normalized = imagePath.replace(/\\/g, '/');
+    const at = normalized.lastIndexOf(prefix);
+    const name = at === -1 ? normalized.split('/').pop() : normalized.slice(at + prefix.length);
+    const url = `${apiUrl}/detected_potholes/${name.split('/').map(encodeURIComponent).join('/')}`;
+    return size ? `${url}?size=${size}` : url;
+};